@@ -54,7 +54,9 @@ create 'user_sessions',
    BLOOMFILTER => 'ROW'},
   {NAME => 'device_data', VERSIONS => 1, COMPRESSION => 'SNAPPY'},
   {NAME => 'geo_data', VERSIONS => 1, COMPRESSION => 'SNAPPY'},
-  {NAME => 'conversion_data', VERSIONS => 1, COMPRESSION => 'SNAPPY'}
+  {NAME => 'conversion_data', VERSIONS => 1, COMPRESSION => 'SNAPPY'},
+  # Row keys start with a 2-hex-char salt, so split on it to spread writes across regions
+  {SPLITS => ['10', '20', '30', '40', '50', '60', '70', '80', '90', 'a0', 'b0', 'c0', 'd0', 'e0', 'f0']}
 
 # Create product_views table for product interaction tracking
 create 'product_views',
@@ -77,7 +79,6 @@ create 'daily_metrics',
   {NAME => 'revenue_metrics', VERSIONS => 1, COMPRESSION => 'SNAPPY'}
 
 # Pre-split tables for better performance
-split 'user_sessions', 'user_005000'
 split 'product_views', 'prod_02500'
 
 # Enable tables
@@ -0,0 +1,25 @@
+# hbase/scripts/hbase_pool.py
+"""
+HBase Connection Pool Helpers
+AUCA Big Data Analytics Final Project
+Shared by the session loaders; kept free of logging setup so importing it has no side effects
+"""
+
+import queue
+import happybase
+
+
+def close_pool(pool: happybase.ConnectionPool):
+    """Close every connection in a happybase pool, which has no close() of its own"""
+    # Dropping the pool does not close its sockets; the idle connections sit in its private
+    # queue. If a happybase release renames it, fall back to leaving them to process exit.
+    idle_connections = getattr(pool, '_queue', None)
+    if idle_connections is None:
+        return
+    
+    while True:
+        try:
+            connection = idle_connections.get_nowait()
+        except queue.Empty:
+            return
+        connection.close()
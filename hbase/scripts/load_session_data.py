@@ -5,15 +5,29 @@ AUCA Big Data Analytics Final Project
 Load session data from JSON files into HBase tables
 """
 
-import json
+import glob
 import os
 import sys
 import logging
+import mmap
+import multiprocessing
+import re
+import threading
+import zlib
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from datetime import datetime
+from functools import lru_cache
+from operator import itemgetter, mul
 from typing import Dict, List, Any
 import happybase
+import ijson
+import orjson
+import pandas as pd
+import zstandard as zstd
 from tqdm import tqdm
 
+from hbase_pool import close_pool
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -25,13 +39,292 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Tables that must exist before loading
+REQUIRED_TABLES = frozenset({b'user_sessions', b'product_views', b'user_events'})
+
+# Session files are named sessions_000.json, sessions_001.json, ...
+SESSION_FILE_PATTERN = re.compile(r"sessions_\d{3}\.json")
+
+# The compose Thrift server runs with -f -c; clients must use the same transport and protocol
+THRIFT_TRANSPORT = 'framed'
+THRIFT_PROTOCOL = 'compact'
+
+# Number of salt buckets prepended to session row keys; match the table's pre-split region count
+SALT_BUCKETS = 256
+
+
+@lru_cache(maxsize=None)
+def _salt_prefixes(salt_buckets: int) -> tuple:
+    """Precomputed b'{salt}_' row-key prefixes, one per bucket"""
+    width = len(f"{salt_buckets - 1:x}")
+    return tuple(f"{bucket:0{width}x}_".encode('ascii') for bucket in range(salt_buckets))
+
+
+def _row_key_salt(user_id: bytes, salt_buckets: int = SALT_BUCKETS) -> bytes:
+    """Deterministic b'{salt}_' prefix for a user so their sessions stay contiguous"""
+    # crc32 rather than hash(): str hashing is randomized per process and workers must agree
+    return _salt_prefixes(salt_buckets)[zlib.crc32(user_id) % salt_buckets]
+
+
+# Shared cell values for missing fields, so defaults are not re-encoded per session
+_EMPTY = b''
+_ZERO = b'0'
+_UNKNOWN = b'unknown'
+_DIRECT = b'direct'
+_BROWSED = b'browsed'
+_NO_TIMESTAMP = b'00000000_000000'
+_ISO_DATE_TIME_SEPARATORS = b'T '
+
+
+# Count columns are ASCII decimal, as in load_session_data_shell.py (its shell and ImportTsv
+# paths can only write text); bytes %-formatting renders the digits in C without a str round trip.
+def _encode_int(value: int) -> bytes:
+    """Encode an integer column value as ASCII decimal"""
+    return b'%d' % value
+
+
+# C-level getters for the cart_total sum
+_get_quantity = itemgetter('quantity')
+_get_unit_price = itemgetter('unit_price')
+
+# JSON blob columns are compressed before the put; one compressor per process
+_ZSTD_COMPRESSOR = zstd.ZstdCompressor(level=3)
+
+# Column qualifiers for the user_sessions table
+_CQ_SESSION_ID = b'session_info:session_id'
+_CQ_USER_ID = b'session_info:user_id'
+_CQ_START_TIME = b'session_info:start_time'
+_CQ_END_TIME = b'session_info:end_time'
+_CQ_DURATION = b'session_info:duration_seconds'
+_CQ_CONVERSION_STATUS = b'session_info:conversion_status'
+_CQ_REFERRER = b'session_info:referrer'
+_CQ_PAGE_COUNT = b'page_views:page_count'
+_CQ_FIRST_PAGE = b'page_views:first_page'
+_CQ_LAST_PAGE = b'page_views:last_page'
+_CQ_PAGE_SUMMARY = b'page_views:page_summary'
+_CQ_DEVICE_TYPE = b'device_data:device_type'
+_CQ_BROWSER = b'device_data:browser'
+_CQ_OS = b'device_data:os'
+_CQ_COUNTRY = b'device_data:country'
+_CQ_STATE = b'device_data:state'
+_CQ_CITY = b'device_data:city'
+_CQ_PRODUCTS_VIEWED = b'conversion_data:products_viewed'
+_CQ_PRODUCT_LIST = b'conversion_data:product_list'
+_CQ_CART_ITEMS = b'conversion_data:cart_items'
+_CQ_CART_VALUE = b'conversion_data:cart_value'
+_CQ_CART_DATA = b'conversion_data:cart_data'
+
+
+def _compress_json(obj) -> bytes:
+    """Serialize a blob column with orjson and zstd-compress it (read back with zstd + orjson.loads)"""
+    return _ZSTD_COMPRESSOR.compress(orjson.dumps(obj))
+
+
+def _encode(value, default: bytes) -> bytes:
+    """Encode a field value as UTF-8, skipping str() when it is already a string"""
+    if value is None:
+        return default
+    if value.__class__ is str:
+        return value.encode('utf-8')
+    return str(value).encode('utf-8')
+
+
+@lru_cache(maxsize=4096)
+def _encode_cached(value: str) -> bytes:
+    """Encode a string once and hand back the same bytes object on every repeat"""
+    return value.encode('utf-8')
+
+
+def _encode_enum(value, default: bytes) -> bytes:
+    """Encode a low-cardinality field (device, browser, os, country, ...) through the cache"""
+    if value.__class__ is str:
+        return _encode_cached(value)
+    return _encode(value, default)
+
+
+def _convert_session_to_hbase_format(session: Dict, salt_buckets: int = SALT_BUCKETS,
+                                     store_raw_json: bool = False) -> tuple:
+    """Convert session JSON to HBase row format (module level so worker processes can pickle it)
+
+    The page_summary, product_list and cart_data JSON blobs are only written when
+    store_raw_json is set, zstd-compressed; analytics read the aggregated counts. Raw
+    payloads are better kept in HBase MOB or a separate blob table than in every session row.
+    """
+    # Fetch each field once
+    get = session.get
+    session_id = get('session_id')
+    user_id = get('user_id')
+    start_time = get('start_time')
+    
+    # Encode once; the same bytes feed both the row key and the session_info cells
+    session_id_b = _encode(session_id, _EMPTY)
+    user_id_b = _encode(user_id, _EMPTY)
+    start_time_b = _encode(start_time, _EMPTY)
+    
+    # Create row key: salt + user_id + timestamp (for time-series queries)
+    key_user_id = _UNKNOWN if user_id is None else user_id_b
+    key_session_id = _UNKNOWN if session_id is None else session_id_b
+    
+    # Create sortable timestamp for row key by slicing the ISO-8601 bytes
+    # (b"2024-01-15T10:30:00..." -> b"20240115_103000") instead of parsing it
+    t = start_time_b
+    if len(t) >= 19 and t[4] == 0x2D and t[10] in _ISO_DATE_TIME_SEPARATORS:
+        timestamp_b = t[0:4] + t[5:7] + t[8:10] + b'_' + t[11:13] + t[14:16] + t[17:19]
+    else:
+        timestamp_b = _NO_TIMESTAMP
+    
+    # Salt spreads writes across regions; scan one user with the prefix "{salt}_{user_id}_"
+    row_key = b''.join((
+        _row_key_salt(key_user_id, salt_buckets), key_user_id, b'_', timestamp_b, b'_', key_session_id
+    ))
+    
+    page_views = get('page_views') or []
+    device_profile = get('device_profile') or {}
+    geo_data = get('geo_data') or {}
+    viewed_products = get('viewed_products') or []
+    cart_contents = get('cart_contents') or {}
+    
+    # Prepare column family data as one literal so the dict is sized once
+    row_data = {
+        # Session info column family
+        _CQ_SESSION_ID: session_id_b,
+        _CQ_USER_ID: user_id_b,
+        _CQ_START_TIME: start_time_b,
+        _CQ_END_TIME: _encode(get('end_time'), _EMPTY),
+        _CQ_DURATION: _encode(get('duration_seconds'), _ZERO),
+        _CQ_CONVERSION_STATUS: _encode_enum(get('conversion_status'), _BROWSED),
+        _CQ_REFERRER: _encode_enum(get('referrer'), _DIRECT),
+        
+        # Page views data
+        _CQ_PAGE_COUNT: _encode_int(len(page_views)),
+        
+        # Device data
+        _CQ_DEVICE_TYPE: _encode_enum(device_profile.get('type'), _UNKNOWN),
+        _CQ_BROWSER: _encode_enum(device_profile.get('browser'), _UNKNOWN),
+        _CQ_OS: _encode_enum(device_profile.get('os'), _UNKNOWN),
+        
+        # Geographic data
+        _CQ_COUNTRY: _encode_enum(geo_data.get('country'), _UNKNOWN),
+        _CQ_STATE: _encode_enum(geo_data.get('state'), _UNKNOWN),
+        _CQ_CITY: _encode(geo_data.get('city'), _UNKNOWN),
+        
+        # Conversion data
+        _CQ_PRODUCTS_VIEWED: _encode_int(len(viewed_products)),
+        _CQ_CART_ITEMS: _encode_int(len(cart_contents)),
+    }
+    
+    if page_views:
+        # Store first and last page info
+        row_data[_CQ_FIRST_PAGE] = _encode_enum(page_views[0].get('page_type'), _EMPTY)
+        row_data[_CQ_LAST_PAGE] = _encode_enum(page_views[-1].get('page_type'), _EMPTY)
+    
+    if page_views and store_raw_json:
+        # Store page view summary as JSON
+        page_summary = [
+            {
+                'page_type': pv.get('page_type'),
+                'view_duration': pv.get('view_duration'),
+                'product_id': pv.get('product_id'),
+                'category_id': pv.get('category_id')
+            }
+            for pv in page_views[:10]  # Limit to first 10 page views
+        ]
+        row_data[_CQ_PAGE_SUMMARY] = _compress_json(page_summary)
+    
+    if viewed_products and store_raw_json:
+        row_data[_CQ_PRODUCT_LIST] = _compress_json(viewed_products)
+    
+    # Cart data
+    if cart_contents:
+        cart_items = cart_contents.values()
+        try:
+            cart_total = sum(map(mul, map(_get_quantity, cart_items), map(_get_unit_price, cart_items)))
+        except KeyError:
+            # Malformed cart item without quantity/unit_price; fall back to defaults
+            cart_total = sum(item.get('quantity', 0) * item.get('unit_price', 0) for item in cart_items)
+        row_data[_CQ_CART_VALUE] = str(cart_total).encode()
+        
+        if store_raw_json:
+            row_data[_CQ_CART_DATA] = _compress_json(cart_contents)
+    
+    return row_key, row_data
+
+
+def _find_session_files(data_dir: str) -> List[str]:
+    """List sessions_NNN.json files in order with a single directory read"""
+    session_files = glob.glob(os.path.join(data_dir, "sessions_*.json"))
+    return sorted(path for path in session_files if SESSION_FILE_PATTERN.fullmatch(os.path.basename(path)))
+
+
+def _load_json_mmap(file_path: str):
+    """Decode a whole JSON file straight from a read-only memory map (no read() copy)"""
+    with open(file_path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return []
+        
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm, memoryview(mm) as view:
+            return orjson.loads(view)
+
+
+# Rows per chunk handed from a parse worker to the writer; matches the default Thrift batch size
+PARSE_CHUNK_ROWS = 5000
+
+# Bounded queue the parse workers put row chunks on, set in each worker by _init_parse_worker
+_chunk_queue = None
+
+
+def _init_parse_worker(chunk_queue):
+    """Give a parse worker process the shared chunk queue (queues can only be passed at startup)"""
+    global _chunk_queue
+    _chunk_queue = chunk_queue
+
+
+def _parse_session_file(file_path: str, salt_buckets: int = SALT_BUCKETS, store_raw_json: bool = False,
+                        chunk_rows: int = PARSE_CHUNK_ROWS) -> int:
+    """Parse one session file into HBase rows inside a worker, queueing them in chunks
+
+    Returns the number of sessions parsed. The put blocks while the queue is full, so a
+    worker never holds more than one chunk however large the file is.
+    """
+    rows = []
+    sessions_parsed = 0
+    
+    # Stream sessions one at a time instead of materializing the whole array
+    with open(file_path, 'rb') as f:
+        for session in ijson.items(f, 'item', use_float=True):
+            rows.append(_convert_session_to_hbase_format(session, salt_buckets, store_raw_json))
+            if len(rows) >= chunk_rows:
+                _chunk_queue.put(rows)
+                sessions_parsed += len(rows)
+                rows = []
+    
+    if rows:
+        _chunk_queue.put(rows)
+        sessions_parsed += len(rows)
+    
+    return sessions_parsed
+
+
 class HBaseSessionLoader:
     """Load session data into HBase for time-series analytics"""
     
-    def __init__(self, host='localhost', port=9090):
+    def __init__(self, host='localhost', port=9090, batch_size=5000, salt_buckets=SALT_BUCKETS, pool_size=8,
+                 store_raw_json: bool = False, skip_wal: bool = True):
         self.host = host
         self.port = port
-        self.connection = None
+        self.batch_size = batch_size  # Rows per Thrift flush; ~5K rows keeps us near the 2MB client write buffer
+        self.salt_buckets = salt_buckets
+        self.store_raw_json = store_raw_json  # Also write the raw page/product/cart JSON blobs
+        # Bulk session loads skip the write-ahead log: edits not yet flushed from the MemStore
+        # are lost if a RegionServer crashes, but this data can be re-loaded from data/raw.
+        # Set skip_wal=False for incremental loads that need full durability.
+        self.skip_wal = skip_wal
+        self.pool_size = pool_size
+        self.pool = None
+        
+        # Sessions confirmed written by the HBase writer thread
+        self._sessions_written = 0
+        self._counter_lock = threading.Lock()
         
         # Ensure log directory exists
         os.makedirs("hbase/logs", exist_ok=True)
@@ -39,17 +332,21 @@ class HBaseSessionLoader:
         logger.info("HBase Session Loader initialized")
 
     def connect(self) -> bool:
-        """Connect to HBase via Thrift"""
+        """Connect to HBase via a pooled Thrift client"""
         try:
-            self.connection = happybase.Connection(
+            # The pool replaces connections that drop mid-load instead of failing the run
+            self.pool = happybase.ConnectionPool(
+                size=self.pool_size,
                 host=self.host,
                 port=self.port,
                 timeout=30000,
-                autoconnect=True
+                transport=THRIFT_TRANSPORT,
+                protocol=THRIFT_PROTOCOL
             )
             
             # Test connection by listing tables
-            tables = self.connection.tables()
+            with self.pool.connection() as connection:
+                tables = connection.tables()
             logger.info(f" Connected to HBase. Available tables: {[t.decode() for t in tables]}")
             return True
             
@@ -60,15 +357,11 @@ class HBaseSessionLoader:
 
     def verify_tables(self) -> bool:
         """Verify required tables exist"""
-        required_tables = [b'user_sessions', b'product_views', b'user_events']
-        
         try:
-            existing_tables = self.connection.tables()
+            with self.pool.connection() as connection:
+                existing_tables = frozenset(connection.tables())
             
-            missing_tables = []
-            for table in required_tables:
-                if table not in existing_tables:
-                    missing_tables.append(table.decode())
+            missing_tables = sorted(table.decode() for table in REQUIRED_TABLES - existing_tables)
             
             if missing_tables:
                 logger.error(f" Missing tables: {missing_tables}")
@@ -86,11 +379,7 @@ class HBaseSessionLoader:
         logger.info(" Starting session data loading into HBase...")
         
         # Find all session files
-        session_files = []
-        for i in range(20):  # We know we have sessions_000.json to sessions_019.json
-            file_path = os.path.join(data_dir, f"sessions_{i:03d}.json")
-            if os.path.exists(file_path):
-                session_files.append(file_path)
+        session_files = _find_session_files(data_dir)
         
         if not session_files:
             logger.error(f" No session files found in {data_dir}")
@@ -98,195 +387,160 @@ class HBaseSessionLoader:
         
         logger.info(f" Found {len(session_files)} session files to load")
         
-        total_sessions_loaded = 0
+        self._sessions_written = 0
         
-        # Get HBase table
-        sessions_table = self.connection.table('user_sessions')
+        # Bounded queue so HBase sends overlap with parsing; workers block on it, so at most
+        # four chunks wait in the parent regardless of file size
+        write_queue = multiprocessing.Queue(maxsize=4)
+        writer = threading.Thread(
+            target=self._hbase_writer,
+            args=(write_queue,),
+            name="hbase-writer",
+            daemon=True
+        )
+        writer.start()
         
-        for file_path in session_files:
-            try:
-                logger.info(f" Loading {os.path.basename(file_path)}...")
-                
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    sessions_data = json.load(f)
-                
-                if not sessions_data:
-                    logger.warning(f"⚠️  No data in {file_path}")
-                    continue
-                
-                # Process sessions in batches
-                batch_size = 1000
-                batch_data = []
+        try:
+            # Parse files in worker processes; JSON decoding is CPU-bound and independent per file
+            max_workers = min(len(session_files), os.cpu_count() or 1)
+            with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_parse_worker,
+                                     initargs=(write_queue,)) as executor:
+                futures = {executor.submit(_parse_session_file, file_path, self.salt_buckets, self.store_raw_json,
+                                           self.batch_size): file_path for file_path in session_files}
                 
-                for session in tqdm(sessions_data, desc=f"Processing {os.path.basename(file_path)}"):
-                    row_key, row_data = self._convert_session_to_hbase_format(session)
-                    batch_data.append((row_key, row_data))
+                # Progress is tracked per file, never per session, to keep tqdm out of the row loop
+                for future in tqdm(as_completed(futures), total=len(futures), desc="Loading session files",
+                                   unit="file", mininterval=1.0):
+                    file_path = futures[future]
                     
-                    # Write batch when it reaches batch_size
-                    if len(batch_data) >= batch_size:
-                        self._write_batch_to_hbase(sessions_table, batch_data)
-                        total_sessions_loaded += len(batch_data)
-                        batch_data = []
-                
-                # Write remaining data
-                if batch_data:
-                    self._write_batch_to_hbase(sessions_table, batch_data)
-                    total_sessions_loaded += len(batch_data)
-                
-                logger.info(f" Loaded {len(sessions_data):,} sessions from {os.path.basename(file_path)}")
-                
-            except Exception as e:
-                logger.error(f" Failed to load {file_path}: {str(e)}")
-                continue
+                    try:
+                        sessions_parsed = future.result()
+                        
+                        if not sessions_parsed:
+                            logger.warning(f"⚠️  No data in {file_path}")
+                            continue
+                        
+                        logger.info(f" Parsed {sessions_parsed:,} sessions from {os.path.basename(file_path)}")
+                        
+                    except Exception as e:
+                        logger.error(f" Failed to load {file_path}: {str(e)}")
+                        continue
         
+        finally:
+            # Workers have exited and flushed their chunks, so the sentinel is queued last;
+            # it tells the writer to stop once the queue is drained
+            write_queue.put(None)
+            writer.join()
+            write_queue.close()
+        
+        total_sessions_loaded = self._sessions_written
         logger.info(f" Total sessions loaded into HBase: {total_sessions_loaded:,}")
         return total_sessions_loaded > 0
 
-    def _convert_session_to_hbase_format(self, session: Dict) -> tuple:
-        """Convert session JSON to HBase row format"""
-        # Create row key: user_id + timestamp (for time-series queries)
-        user_id = session.get('user_id', 'unknown')
-        start_time = session.get('start_time', '')
+    def _hbase_writer(self, write_queue: multiprocessing.Queue):
+        """Stream queued rows into one auto-flushing HBase batch until the sentinel arrives"""
+        finished = False
         
-        # Create sortable timestamp for row key
         try:
-            dt = datetime.fromisoformat(start_time.replace('Z', '+00:00'))
-            timestamp_str = dt.strftime('%Y%m%d_%H%M%S')
-        except:
-            timestamp_str = '00000000_000000'
-        
-        row_key = f"{user_id}_{timestamp_str}_{session.get('session_id', 'unknown')}"
-        
-        # Prepare column family data
-        row_data = {}
-        
-        # Session info column family
-        row_data[b'session_info:session_id'] = str(session.get('session_id', '')).encode('utf-8')
-        row_data[b'session_info:user_id'] = str(session.get('user_id', '')).encode('utf-8')
-        row_data[b'session_info:start_time'] = str(session.get('start_time', '')).encode('utf-8')
-        row_data[b'session_info:end_time'] = str(session.get('end_time', '')).encode('utf-8')
-        row_data[b'session_info:duration_seconds'] = str(session.get('duration_seconds', 0)).encode('utf-8')
-        row_data[b'session_info:conversion_status'] = str(session.get('conversion_status', 'browsed')).encode('utf-8')
-        row_data[b'session_info:referrer'] = str(session.get('referrer', 'direct')).encode('utf-8')
-        
-        # Page views data
-        page_views = session.get('page_views', [])
-        row_data[b'page_views:page_count'] = str(len(page_views)).encode('utf-8')
-        
-        if page_views:
-            # Store first and last page info
-            row_data[b'page_views:first_page'] = str(page_views[0].get('page_type', '')).encode('utf-8')
-            row_data[b'page_views:last_page'] = str(page_views[-1].get('page_type', '')).encode('utf-8')
-            
-            # Store page view summary as JSON
-            page_summary = [
-                {
-                    'page_type': pv.get('page_type'),
-                    'view_duration': pv.get('view_duration'),
-                    'product_id': pv.get('product_id'),
-                    'category_id': pv.get('category_id')
-                }
-                for pv in page_views[:10]  # Limit to first 10 page views
-            ]
-            row_data[b'page_views:page_summary'] = json.dumps(page_summary).encode('utf-8')
-        
-        # Device data
-        device_profile = session.get('device_profile', {})
-        row_data[b'device_data:device_type'] = str(device_profile.get('type', 'unknown')).encode('utf-8')
-        row_data[b'device_data:browser'] = str(device_profile.get('browser', 'unknown')).encode('utf-8')
-        row_data[b'device_data:os'] = str(device_profile.get('os', 'unknown')).encode('utf-8')
-        
-        # Geographic data
-        geo_data = session.get('geo_data', {})
-        row_data[b'device_data:country'] = str(geo_data.get('country', 'unknown')).encode('utf-8')
-        row_data[b'device_data:state'] = str(geo_data.get('state', 'unknown')).encode('utf-8')
-        row_data[b'device_data:city'] = str(geo_data.get('city', 'unknown')).encode('utf-8')
-        
-        # Conversion data
-        viewed_products = session.get('viewed_products', [])
-        row_data[b'conversion_data:products_viewed'] = str(len(viewed_products)).encode('utf-8')
-        
-        if viewed_products:
-            row_data[b'conversion_data:product_list'] = json.dumps(viewed_products).encode('utf-8')
-        
-        # Cart data
-        cart_contents = session.get('cart_contents', {})
-        row_data[b'conversion_data:cart_items'] = str(len(cart_contents)).encode('utf-8')
-        
-        if cart_contents:
-            cart_total = sum(item.get('quantity', 0) * item.get('unit_price', 0) 
-                           for item in cart_contents.values())
-            row_data[b'conversion_data:cart_value'] = str(cart_total).encode('utf-8')
-            row_data[b'conversion_data:cart_data'] = json.dumps(cart_contents).encode('utf-8')
-        
-        return row_key.encode('utf-8'), row_data
-
-    def _write_batch_to_hbase(self, table, batch_data: List[tuple]):
-        """Write batch of data to HBase"""
-        try:
-            # Create batch
-            batch = table.batch()
-            
-            for row_key, row_data in batch_data:
-                batch.put(row_key, row_data)
-            
-            # Send batch
-            batch.send()
+            # Thrift connections stay in this process (they are not fork-safe); one batch
+            # spans every file so the write buffer fills without per-file flush boundaries
+            with self.pool.connection() as connection:
+                sessions_table = connection.table('user_sessions')
+                
+                # happybase sends the batch every batch_size puts and once more on exit
+                with sessions_table.batch(batch_size=self.batch_size, transaction=False,
+                                          wal=not self.skip_wal) as batch:
+                    while True:
+                        rows = write_queue.get()
+                        if rows is None:
+                            finished = True
+                            break
+                        
+                        for row_key, row_data in rows:
+                            batch.put(row_key, row_data)
+                        
+                        with self._counter_lock:
+                            self._sessions_written += len(rows)
             
         except Exception as e:
             logger.error(f" Failed to write batch to HBase: {str(e)}")
-            raise
+            with self._counter_lock:
+                self._sessions_written = 0
+            
+            # Keep draining so the producer never blocks on a full queue
+            while not finished:
+                finished = write_queue.get() is None
 
     def load_product_interaction_data(self):
         """Load product interaction data from sessions into product_views table"""
         logger.info(" Loading product interaction data...")
         
         try:
-            # Read session data and extract product interactions
-            interactions = {}
+            # Running per-product view/conversion sums and the distinct (product, user) pairs seen so
+            # far; each file is aggregated on its own so only one file's views are held at a time
+            view_totals = None
+            viewer_pairs = None
             
             # Process session files to extract product views
-            for i in range(5):  # Process first 5 session files for demo
-                file_path = f"data/raw/sessions_{i:03d}.json"
-                if not os.path.exists(file_path):
-                    continue
-                    
-                with open(file_path, 'r') as f:
-                    sessions_data = json.load(f)
+            for file_path in _find_session_files("data/raw"):
+                sessions_data = _load_json_mmap(file_path)
+                
+                # Flatten the file's (product view, user, converted) triples into columns
+                product_ids = []
+                user_ids = []
+                converted = []
                 
                 for session in sessions_data:
-                    for product_id in session.get('viewed_products', []):
-                        if product_id not in interactions:
-                            interactions[product_id] = {
-                                'view_count': 0,
-                                'total_duration': 0,
-                                'unique_users': set(),
-                                'conversion_count': 0
-                            }
-                        
-                        interactions[product_id]['view_count'] += 1
-                        interactions[product_id]['unique_users'].add(session['user_id'])
-                        
-                        if session.get('conversion_status') == 'converted':
-                            interactions[product_id]['conversion_count'] += 1
+                    viewed_products = session.get('viewed_products') or []
+                    if not viewed_products:
+                        continue
+                    
+                    view_count = len(viewed_products)
+                    product_ids.extend(viewed_products)
+                    user_ids.extend([session['user_id']] * view_count)
+                    converted.extend([session.get('conversion_status') == 'converted'] * view_count)
+                
+                del sessions_data
+                if not product_ids:
+                    continue
+                
+                # Aggregate in pandas' C hash groupby
+                views_df = pd.DataFrame({'product_id': product_ids, 'user_id': user_ids, 'converted': converted})
+                file_totals = views_df.groupby('product_id', sort=False).agg(
+                    view_count=('user_id', 'size'),
+                    conversion_count=('converted', 'sum')
+                )
+                view_totals = file_totals if view_totals is None else view_totals.add(file_totals, fill_value=0)
+                
+                file_pairs = views_df[['product_id', 'user_id']].drop_duplicates()
+                if viewer_pairs is not None:
+                    file_pairs = pd.concat([viewer_pairs, file_pairs], ignore_index=True).drop_duplicates()
+                viewer_pairs = file_pairs
             
-            # Load into product_views table
-            product_table = self.connection.table('product_views')
-            batch = product_table.batch()
+            if view_totals is None:
+                logger.warning("⚠️  No product views found in session files")
+                return
             
-            for product_id, data in interactions.items():
-                row_key = f"product_{product_id}_{datetime.now().strftime('%Y%m%d')}"
-                
-                row_data = {
-                    b'view_metrics:view_count': str(data['view_count']).encode('utf-8'),
-                    b'view_metrics:unique_users': str(len(data['unique_users'])).encode('utf-8'),
-                    b'view_metrics:conversion_count': str(data['conversion_count']).encode('utf-8'),
-                    b'interaction_data:last_updated': datetime.now().isoformat().encode('utf-8')
-                }
+            interactions = view_totals.astype('int64')
+            interactions.insert(1, 'unique_users', viewer_pairs.groupby('product_id', sort=False).size())
+            
+            # Load into product_views table
+            with self.pool.connection() as connection:
+                product_table = connection.table('product_views')
                 
-                batch.put(row_key.encode('utf-8'), row_data)
+                with product_table.batch(batch_size=self.batch_size, transaction=False) as batch:
+                    for product_id, view_count, unique_users, conversion_count in interactions.itertuples(name=None):
+                        row_key = f"product_{product_id}_{datetime.now().strftime('%Y%m%d')}"
+                        
+                        row_data = {
+                            b'view_metrics:view_count': str(view_count).encode('utf-8'),
+                            b'view_metrics:unique_users': str(unique_users).encode('utf-8'),
+                            b'view_metrics:conversion_count': str(conversion_count).encode('utf-8'),
+                            b'interaction_data:last_updated': datetime.now().isoformat().encode('utf-8')
+                        }
+                        
+                        batch.put(row_key.encode('utf-8'), row_data)
             
-            batch.send()
             logger.info(f" Loaded product interaction data for {len(interactions)} products")
             
         except Exception as e:
@@ -297,24 +551,25 @@ class HBaseSessionLoader:
         logger.info("Verifying HBase data loading...")
         
         try:
-            # Check user_sessions table
-            sessions_table = self.connection.table('user_sessions')
-            session_count = 0
-            
-            # Scan first 100 rows as verification
-            for key, data in sessions_table.scan(limit=100):
-                session_count += 1
-            
-            logger.info(f" Verified: {session_count} session records accessible")
-            
-            # Check product_views table
-            product_table = self.connection.table('product_views')
-            product_count = 0
-            
-            for key, data in product_table.scan(limit=10):
-                product_count += 1
-            
-            logger.info(f" Verified: {product_count} product interaction records")
+            with self.pool.connection() as connection:
+                # Check user_sessions table
+                sessions_table = connection.table('user_sessions')
+                session_count = 0
+                
+                # Scan first 100 rows as verification
+                for key, data in sessions_table.scan(limit=100):
+                    session_count += 1
+                
+                logger.info(f" Verified: {session_count} session records accessible")
+                
+                # Check product_views table
+                product_table = connection.table('product_views')
+                product_count = 0
+                
+                for key, data in product_table.scan(limit=10):
+                    product_count += 1
+                
+                logger.info(f" Verified: {product_count} product interaction records")
             
             return session_count > 0
             
@@ -362,9 +617,10 @@ class HBaseSessionLoader:
             return False
         
         finally:
-            if self.connection:
-                self.connection.close()
-                logger.info("🔌 HBase connection closed")
+            if self.pool:
+                close_pool(self.pool)
+                self.pool = None
+                logger.info("🔌 HBase connection pool closed")
 
 
 if __name__ == "__main__":
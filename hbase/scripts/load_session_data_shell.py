@@ -2,36 +2,247 @@
 """
 HBase Shell Data Loader (Alternative)
 AUCA Big Data Analytics Final Project
-Load session data using HBase shell commands instead of Thrift API
+Load session data with batched Thrift puts, keeping HBase shell commands as a fallback
 """
 
-import json
+import argparse
+import atexit
+import glob
 import os
 import sys
 import logging
+import logging.handlers
+import multiprocessing
 import subprocess
 import tempfile
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import Dict, List, Any
+from functools import lru_cache, partial
+from typing import Dict, List, Optional
+import happybase
+import ijson
 from tqdm import tqdm
 
-# Configure logging
+from hbase_pool import close_pool
+
+# Configure logging: records are queued and written by a listener thread, so file and
+# console I/O stays off the ingest loop. A multiprocessing queue lets pool workers log too.
+_LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+_log_queue = multiprocessing.Queue(-1)
 logging.basicConfig(
     level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
+    format=_LOG_FORMAT,
+    handlers=[logging.handlers.QueueHandler(_log_queue)]
+)
+logger = logging.getLogger(__name__)
+
+if multiprocessing.parent_process() is None:
+    _log_listener = logging.handlers.QueueListener(
+        _log_queue,
         logging.FileHandler('hbase/logs/shell_data_loading.log', mode='w'),
         logging.StreamHandler()
-    ]
+    )
+    _log_listener.start()
+    atexit.register(_log_listener.stop)
+
+
+def _init_worker_logging(log_queue):
+    """Send a pool worker's log records to the parent's listener"""
+    handler = logging.handlers.QueueHandler(log_queue)
+    handler.setFormatter(logging.Formatter(_LOG_FORMAT))
+    root = logging.getLogger()
+    root.handlers = [handler]
+    root.setLevel(logging.INFO)
+
+
+# Printed by the persistent hbase shell after each batch
+SHELL_BATCH_SENTINEL = '===BATCH_DONE==='
+
+# Must match the compose Thrift server flags (-f framed transport, -c compact protocol)
+THRIFT_TRANSPORT = 'framed'
+THRIFT_PROTOCOL = 'compact'
+
+# Row-key salt buckets (2 hex chars); user_sessions is pre-split on them in init-hbase.sh
+SALT_BUCKETS = 256
+
+# JRuby run once per shell so each session can be written as a single multi-column Put
+_SHELL_PREAMBLE = (
+    "import org.apache.hadoop.hbase.client.Put",
+    "import org.apache.hadoop.hbase.util.Bytes",
+    "sessions_table = get_table('user_sessions').table",
 )
-logger = logging.getLogger(__name__)
+# One row mutation for user_sessions: (row key, chained addColumn calls)
+_PUT_ROW = "sessions_table.put(Put.new(Bytes.toBytes('%s'))%s)"
+
+# (column, session key, default) for values copied straight from the session / its device profile
+_SESSION_COLS = (
+    ('session_info:session_id', 'session_id', ''),
+    ('session_info:user_id', 'user_id', ''),
+    ('session_info:start_time', 'start_time', ''),
+    ('session_info:duration_seconds', 'duration_seconds', 0),
+    ('session_info:conversion_status', 'conversion_status', 'browsed'),
+)
+_DEVICE_COLS = (
+    ('device_data:device_type', 'type', 'unknown'),
+    ('device_data:browser', 'browser', 'unknown'),
+    ('device_data:os', 'os', 'unknown'),
+)
+# Fixed TSV column order for ImportTsv bulk loads
+_BULK_COLUMNS = tuple(c for c, _, _ in _SESSION_COLS + _DEVICE_COLS) + (
+    'page_views:page_count',
+    'page_views:first_page',
+    'page_views:last_page',
+    'conversion_data:products_viewed',
+    'conversion_data:cart_items',
+)
+_BULK_COLUMNS_B = tuple(c.encode('utf-8') for c in _BULK_COLUMNS)
+_SESSION_COLS_B = tuple((c.encode('utf-8'), k, d) for c, k, d in _SESSION_COLS)
+_DEVICE_COLS_B = tuple((c.encode('utf-8'), k, d) for c, k, d in _DEVICE_COLS)
+
+
+@lru_cache(maxsize=None)
+def _shell_add_column(column: bytes) -> str:
+    """JRuby addColumn call for a family:qualifier column, with a %s slot for the value"""
+    family, qualifier = column.decode('utf-8').split(':', 1)
+    return f".addColumn(Bytes.toBytes('{family}'), Bytes.toBytes('{qualifier}'), Bytes.toBytes('%s'))"
+
+
+def _session_row_key(session: Dict) -> str:
+    """Build the salt_user_id_YYYYmmdd_HHMMSS_session_id row key"""
+    user_id = session.get('user_id', 'unknown')
+    start_time = session.get('start_time', '')
+    
+    # start_time is always ISO 8601 (YYYY-MM-DDTHH:MM:SS...), so slice the digits out directly
+    if isinstance(start_time, str) and len(start_time) >= 19:
+        timestamp_str = f"{start_time[0:4]}{start_time[5:7]}{start_time[8:10]}_{start_time[11:13]}{start_time[14:16]}{start_time[17:19]}"
+    else:
+        timestamp_str = '00000000_000000'
+    
+    # Salt spreads writes across regions; scan one user with the prefix "{salt}_{user_id}_"
+    salt = zlib.crc32(str(user_id).encode('utf-8')) % SALT_BUCKETS
+    
+    return f"{salt:02x}_{user_id}_{timestamp_str}_{session.get('session_id', 'unknown')}"
+
+
+def _convert_session_to_hbase_columns(session: Dict) -> tuple:
+    """Convert session to an HBase row key and column dict for a Thrift put"""
+    row_key = _session_row_key(session)
+    
+    sg = session.get
+    dg = sg('device_profile', {}).get
+    page_views = sg('page_views', [])
+    
+    # Same columns as the shell put commands; counts are ASCII decimal, matching load_session_data.py
+    columns = {c: str(sg(k, d)).encode('utf-8') for c, k, d in _SESSION_COLS_B}
+    for c, k, d in _DEVICE_COLS_B:
+        columns[c] = str(dg(k, d)).encode('utf-8')
+    columns[b'page_views:page_count'] = str(len(page_views)).encode('utf-8')
+    columns[b'conversion_data:products_viewed'] = str(len(sg('viewed_products', []))).encode('utf-8')
+    columns[b'conversion_data:cart_items'] = str(len(sg('cart_contents', {}))).encode('utf-8')
+    
+    if page_views:
+        columns[b'page_views:first_page'] = str(page_views[0].get('page_type', '')).encode('utf-8')
+        columns[b'page_views:last_page'] = str(page_views[-1].get('page_type', '')).encode('utf-8')
+    
+    return row_key, columns
+
+
+def _ingest_file(file_path: str, host: str = 'localhost', port: int = 9090, batch_size: int = 10000,
+                 skip_wal: bool = True) -> Optional[tuple]:
+    """Load one session file over its own Thrift connection (runs in a worker process)
+
+    Returns (sessions, puts), or None if the file failed part-way and its rows cannot be counted.
+    """
+    sessions_processed = 0
+    
+    # Thrift connections are not fork-safe, so each worker opens its own
+    connection = happybase.Connection(host=host, port=port, timeout=30000,
+                                      transport=THRIFT_TRANSPORT, protocol=THRIFT_PROTOCOL)
+    
+    try:
+        sessions_table = connection.table('user_sessions')
+        
+        # Stream sessions straight into an auto-flushing batch so only one batch is held in memory
+        with open(file_path, 'rb') as f, \
+                sessions_table.batch(batch_size=batch_size, transaction=False, wal=not skip_wal) as batch:
+            for session in ijson.items(f, 'item', use_float=True):
+                try:
+                    row_key, columns = _convert_session_to_hbase_columns(session)
+                    batch.put(row_key.encode('utf-8'), columns)
+                    sessions_processed += 1
+                except Exception as e:
+                    logger.warning(f"⚠️  Failed to process session {session.get('session_id', 'unknown')}: {str(e)}")
+                    continue
+        
+        if not sessions_processed:
+            logger.warning(f"⚠️  No data in {file_path}")
+            return 0, 0
+        
+        logger.info(f" Completed loading {sessions_processed:,} sessions from {os.path.basename(file_path)}")
+        
+    except Exception as e:
+        logger.error(f" Failed to load {file_path}: {str(e)}")
+        return None
+    
+    finally:
+        connection.close()
+    
+    return sessions_processed, sessions_processed
+
+
+def _write_bulk_tsv(file_path: str, out_dir: str) -> tuple:
+    """Convert one session file into an ImportTsv input file (runs in a worker process)"""
+    sessions_processed = 0
+    tsv_path = os.path.join(out_dir, os.path.basename(file_path).replace('.json', '.tsv'))
+    
+    with open(file_path, 'rb') as f, open(tsv_path, 'wb') as out:
+        for session in ijson.items(f, 'item', use_float=True):
+            try:
+                row_key, columns = _convert_session_to_hbase_columns(session)
+                # Missing columns (first/last page) stay empty and are skipped by ImportTsv
+                values = [columns.get(c, b'') for c in _BULK_COLUMNS_B]
+                out.write(b'\t'.join([row_key.encode('utf-8')] + values) + b'\n')
+                sessions_processed += 1
+            except Exception as e:
+                logger.warning(f"⚠️  Failed to process session {session.get('session_id', 'unknown')}: {str(e)}")
+                continue
+    
+    return tsv_path, sessions_processed
+
 
 class HBaseShellLoader:
-    """Load session data into HBase using shell commands"""
+    """Load session data into HBase using Thrift batches (or shell commands with use_shell)"""
     
-    def __init__(self):
+    def __init__(self, use_shell: bool = False, host: str = 'localhost', port: int = 9090, bulk_load: bool = False,
+                 skip_wal: bool = True):
         self.docker_compose_path = "config/docker/docker-compose-working.yml"
-        self.batch_size = 50  # Optimized batch size for all data
+        self.batch_size = 50  # Session rows per shell batch
+        self.thrift_batch_size = 10000  # Puts per Thrift mutateRows flush
+        
+        # The shell applies one row Put at a time from text piped through docker, while Thrift sends
+        # batched mutateRows from parallel workers; only use the shell when Thrift is unavailable
+        self.use_shell = use_shell
+        self.host = host
+        self.port = port
+        self.num_workers = min(8, os.cpu_count() or 1)
+        
+        # Sessions can always be re-imported from data/raw, so trade crash durability for
+        # write throughput unless skip_wal=False
+        self.skip_wal = skip_wal
+        
+        # Bulk load writes HFiles with ImportTsv and links them in, bypassing the write path
+        self.bulk_load = bulk_load
+        self.bulk_staging_dir = "hbase/bulk"
+        self.bulk_hdfs_dir = "/bulk/user_sessions"
+        
+        # Thrift pool for the health check and verification, opened by test_hbase_connection
+        self.pool = None
+        
+        # Long-lived hbase shell for the fallback path, started on the first batch
+        self.shell = None
+        atexit.register(self._close_shell)
         
         # Ensure log directory exists
         os.makedirs("hbase/logs", exist_ok=True)
@@ -39,7 +250,23 @@ class HBaseShellLoader:
         logger.info("HBase Shell Loader initialized")
 
     def test_hbase_connection(self) -> bool:
-        """Test HBase shell connectivity"""
+        """Test HBase connectivity over Thrift, or the HBase shell in fallback mode"""
+        if not self.use_shell:
+            try:
+                self.pool = happybase.ConnectionPool(size=4, host=self.host, port=self.port, timeout=30000,
+                                                     transport=THRIFT_TRANSPORT, protocol=THRIFT_PROTOCOL)
+                with self.pool.connection() as connection:
+                    tables = connection.tables()
+                if b'user_sessions' not in tables:
+                    logger.error(" user_sessions table not found - run config/docker/init-hbase.sh first")
+                    return False
+                logger.info(f" Connected to HBase Thrift. Available tables: {[t.decode() for t in tables]}")
+                return True
+            except Exception as e:
+                logger.error(f" HBase Thrift connection error: {str(e)}")
+                logger.info("💡 Make sure HBase Thrift server is running, or rerun with --fallback")
+                return False
+        
         try:
             # Create a simple test script
             test_script = "list\nexit\n"
@@ -51,7 +278,7 @@ class HBaseShellLoader:
             try:
                 # Copy to container
                 copy_cmd = ['docker', 'cp', temp_file, 'ecommerce_hbase_master:/tmp/test.hbase']
-                subprocess.run(copy_cmd, check=True, capture_output=True)
+                subprocess.run(copy_cmd, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
                 
                 # Execute in container
                 cmd = [
@@ -90,7 +317,7 @@ class HBaseShellLoader:
             try:
                 # Copy file to container and execute
                 copy_cmd = ['docker', 'cp', temp_file, 'ecommerce_hbase_master:/tmp/hbase_cmd.txt']
-                subprocess.run(copy_cmd, check=True, capture_output=True)
+                subprocess.run(copy_cmd, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
                 
                 exec_cmd = [
                     'docker', 'compose', '-f', self.docker_compose_path,
@@ -117,12 +344,8 @@ class HBaseShellLoader:
         """Load ALL session data from all session files into HBase"""
         logger.info(" Starting complete session data loading into HBase...")
         
-        # Find all session files
-        session_files = []
-        for i in range(20):  # We have sessions_000.json to sessions_019.json
-            file_path = f"data/raw/sessions_{i:03d}.json"
-            if os.path.exists(file_path):
-                session_files.append(file_path)
+        # Find all session files (sessions_000.json, sessions_001.json, ...)
+        session_files = sorted(glob.glob("data/raw/sessions_*.json"))
         
         if not session_files:
             logger.error(" No session files found in data/raw")
@@ -131,161 +354,279 @@ class HBaseShellLoader:
         logger.info(f" Found {len(session_files)} session files to load")
         logger.info(" This will load ALL ~200,000 sessions - please be patient!")
         
+        if self.bulk_load:
+            total_sessions_processed, total_commands_executed = self._load_files_via_bulkload(session_files)
+        elif self.use_shell:
+            total_sessions_processed, total_commands_executed = self._load_files_via_shell(session_files)
+        else:
+            total_sessions_processed, total_commands_executed = self._load_files_via_thrift(session_files)
+        
+        logger.info("=" * 60)
+        logger.info(f" COMPLETE SESSION DATA LOADING FINISHED!")
+        logger.info(f" Total sessions processed: {total_sessions_processed:,}")
+        logger.info(f"⚡ Total HBase puts executed: {total_commands_executed:,}")
+        logger.info("=" * 60)
+        
+        return total_sessions_processed > 0
+
+    def _load_files_via_shell(self, session_files: List[str]) -> tuple:
+        """Load session files serially with batched HBase shell commands"""
+        total_sessions_processed = 0
+        total_commands_executed = 0
+        
+        # Shell puts have no per-mutation durability, so skip the WAL at table level for the load
+        if self.skip_wal:
+            self._execute_batch_commands(["alter 'user_sessions', METHOD => 'table_att', DURABILITY => 'SKIP_WAL'"])
+        
+        try:
+            total_sessions_processed, total_commands_executed = self._load_shell_batches(session_files)
+        finally:
+            if self.skip_wal:
+                self._execute_batch_commands(["alter 'user_sessions', METHOD => 'table_att', DURABILITY => 'USE_DEFAULT'"])
+        
+        return total_sessions_processed, total_commands_executed
+
+    def _load_shell_batches(self, session_files: List[str]) -> tuple:
+        """Stream every session file through the persistent shell in put batches"""
         total_sessions_processed = 0
         total_commands_executed = 0
         
+        # A single writer thread owns the shell, so the next batch is converted while the current one runs
+        executor = ThreadPoolExecutor(max_workers=1)
+        inflight = deque()
+        
         for file_index, file_path in enumerate(session_files):
             try:
-                logger.info(f" Loading {os.path.basename(file_path)} ({file_index + 1}/{len(session_files)})...")
-                
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    sessions_data = json.load(f)
-                
-                if not sessions_data:
-                    logger.warning(f"⚠️  No data in {file_path}")
-                    continue
-                
-                logger.info(f"📋 Processing {len(sessions_data):,} sessions from {os.path.basename(file_path)}")
+                file_name = os.path.basename(file_path)
+                logger.info(f" Loading {file_name} ({file_index + 1}/{len(session_files)})...")
                 
                 # Process sessions in batches for better performance
-                batch_size = 50  # Optimized batch size
+                batch_size = self.batch_size
                 batch_commands = []
+                file_sessions = 0
                 
-                for i, session in enumerate(tqdm(sessions_data, desc=f"Processing {os.path.basename(file_path)}")):
-                    try:
-                        # Convert session to HBase format
-                        row_key, put_commands = self._convert_session_to_hbase_commands(session)
-                        
-                        # Add commands to batch
-                        batch_commands.extend(put_commands)
-                        
-                        # Execute batch when it reaches batch_size
-                        if len(batch_commands) >= batch_size:
-                            success = self._execute_batch_commands(batch_commands)
-                            if success:
-                                total_commands_executed += len(batch_commands)
-                            batch_commands = []
+                with open(file_path, 'rb') as f:
+                    sessions = ijson.items(f, 'item', use_float=True)
+                    # Redraw at most every 500 sessions / 0.5s instead of once per session
+                    for session in tqdm(sessions, desc=f"Processing {file_name}",
+                                        miniters=500, mininterval=0.5):
+                        try:
+                            # Convert session to HBase format
+                            row_key, put_commands = self._convert_session_to_hbase_commands(session)
+                            
+                            # Add commands to batch
+                            batch_commands.extend(put_commands)
+                            
+                            # Execute batch when it reaches batch_size
+                            if len(batch_commands) >= batch_size:
+                                inflight.append((executor.submit(self._execute_batch_commands, batch_commands),
+                                                 len(batch_commands)))
+                                total_commands_executed += self._drain_batches(inflight, max_inflight=2)
+                                batch_commands = []
                         
-                        total_sessions_processed += 1
+                            total_sessions_processed += 1
+                            file_sessions += 1
+                            
+                            # Progress update every 1000 sessions
+                            if file_sessions % 1000 == 0:
+                                logger.info(f"   Processed {file_sessions:,} sessions from {file_name}")
                         
-                        # Progress update every 1000 sessions
-                        if (i + 1) % 1000 == 0:
-                            logger.info(f"   Processed {i + 1:,}/{len(sessions_data):,} sessions from {os.path.basename(file_path)}")
-                    
-                    except Exception as e:
-                        logger.warning(f"⚠️  Failed to process session {session.get('session_id', 'unknown')}: {str(e)}")
-                        continue
+                        except Exception as e:
+                            logger.warning(f"⚠️  Failed to process session {session.get('session_id', 'unknown')}: {str(e)}")
+                            continue
+                
+                if not file_sessions:
+                    logger.warning(f"⚠️  No data in {file_path}")
+                    continue
                 
-                # Execute remaining commands in batch
+                # Execute remaining commands in batch, then wait for the file's batches to finish
                 if batch_commands:
-                    success = self._execute_batch_commands(batch_commands)
-                    if success:
-                        total_commands_executed += len(batch_commands)
+                    inflight.append((executor.submit(self._execute_batch_commands, batch_commands),
+                                     len(batch_commands)))
+                total_commands_executed += self._drain_batches(inflight, max_inflight=0)
                 
-                logger.info(f" Completed loading {len(sessions_data):,} sessions from {os.path.basename(file_path)}")
+                logger.info(f" Completed loading {file_sessions:,} sessions from {file_name}")
                 
             except Exception as e:
                 logger.error(f" Failed to load {file_path}: {str(e)}")
                 continue
         
-        logger.info("=" * 60)
-        logger.info(f" COMPLETE SESSION DATA LOADING FINISHED!")
-        logger.info(f" Total sessions processed: {total_sessions_processed:,}")
-        logger.info(f"⚡ Total HBase commands executed: {total_commands_executed:,}")
-        logger.info("=" * 60)
+        total_commands_executed += self._drain_batches(inflight, max_inflight=0)
+        executor.shutdown()
         
-        return total_sessions_processed > 0
+        return total_sessions_processed, total_commands_executed
 
-    def _execute_batch_commands(self, commands: List[str]) -> bool:
-        """Execute a batch of HBase commands efficiently"""
-        try:
-            # Create batch script
-            batch_script = "\n".join(commands) + "\nexit\n"
-            
-            with tempfile.NamedTemporaryFile(mode='w', delete=False, suffix='.hbase') as f:
-                f.write(batch_script)
-                temp_file = f.name
-            
-            try:
-                # Copy to container
-                copy_cmd = ['docker', 'cp', temp_file, 'ecommerce_hbase_master:/tmp/batch_cmd.hbase']
-                subprocess.run(copy_cmd, check=True, capture_output=True)
-                
-                # Execute batch
-                exec_cmd = [
-                    'docker', 'compose', '-f', self.docker_compose_path,
-                    'exec', '-T', 'hbase-master', 'hbase', 'shell', '/tmp/batch_cmd.hbase'
-                ]
-                
-                result = subprocess.run(exec_cmd, capture_output=True, text=True, timeout=120)
-                
-                if result.returncode == 0:
-                    return True
-                else:
-                    logger.warning(f"⚠️  Batch execution had issues: {result.stderr}")
-                    return False
-                    
-            finally:
-                # Clean up
-                os.unlink(temp_file)
-                
-        except Exception as e:
-            logger.error(f" Failed to execute batch commands: {str(e)}")
-            return False
+    def _drain_batches(self, inflight: deque, max_inflight: int) -> int:
+        """Wait for queued shell batches until at most max_inflight remain; return the puts executed"""
+        commands_executed = 0
+        while len(inflight) > max_inflight:
+            future, command_count = inflight.popleft()
+            if future.result():
+                commands_executed += command_count
+        return commands_executed
 
-    def _convert_session_to_hbase_commands(self, session: Dict) -> tuple:
-        """Convert session to HBase put commands"""
-        # Create row key
-        user_id = session.get('user_id', 'unknown')
-        start_time = session.get('start_time', '')
-        
-        try:
-            dt = datetime.fromisoformat(start_time.replace('Z', '+00:00'))
-            timestamp_str = dt.strftime('%Y%m%d_%H%M%S')
-        except:
-            timestamp_str = '00000000_000000'
-        
-        row_key = f"{user_id}_{timestamp_str}_{session.get('session_id', 'unknown')}"
+    def _load_files_via_thrift(self, session_files: List[str]) -> tuple:
+        """Load session files in parallel worker processes, each with its own Thrift connection"""
+        ingest = partial(_ingest_file, host=self.host, port=self.port, batch_size=self.thrift_batch_size,
+                         skip_wal=self.skip_wal)
+        total_sessions_processed = 0
+        total_commands_executed = 0
+        failed_files = 0
         
-        # Create put commands
-        put_commands = []
+        with multiprocessing.Pool(min(self.num_workers, len(session_files)),
+                                  initializer=_init_worker_logging, initargs=(_log_queue,)) as pool:
+            for result in tqdm(pool.imap_unordered(ingest, session_files),
+                               total=len(session_files), desc="Loading session files"):
+                if result is None:
+                    failed_files += 1
+                    continue
+                sessions_processed, puts_executed = result
+                total_sessions_processed += sessions_processed
+                total_commands_executed += puts_executed
         
-        # Session info
-        put_commands.append(f"put 'user_sessions', '{row_key}', 'session_info:session_id', '{session.get('session_id', '')}'")
-        put_commands.append(f"put 'user_sessions', '{row_key}', 'session_info:user_id', '{session.get('user_id', '')}'")
-        put_commands.append(f"put 'user_sessions', '{row_key}', 'session_info:start_time', '{session.get('start_time', '')}'")
-        put_commands.append(f"put 'user_sessions', '{row_key}', 'session_info:duration_seconds', '{session.get('duration_seconds', 0)}'")
-        put_commands.append(f"put 'user_sessions', '{row_key}', 'session_info:conversion_status', '{session.get('conversion_status', 'browsed')}'")
+        if failed_files:
+            logger.error(f" {failed_files} of {len(session_files)} session files failed to load; "
+                         f"their partially written rows are not counted")
         
-        # Device data
-        device_profile = session.get('device_profile', {})
-        put_commands.append(f"put 'user_sessions', '{row_key}', 'device_data:device_type', '{device_profile.get('type', 'unknown')}'")
-        put_commands.append(f"put 'user_sessions', '{row_key}', 'device_data:browser', '{device_profile.get('browser', 'unknown')}'")
-        put_commands.append(f"put 'user_sessions', '{row_key}', 'device_data:os', '{device_profile.get('os', 'unknown')}'")
+        return total_sessions_processed, total_commands_executed
+
+    def _load_files_via_bulkload(self, session_files: List[str]) -> tuple:
+        """Load session files as HFiles: write TSVs, run ImportTsv in bulk-output mode, then completebulkload"""
+        os.makedirs(self.bulk_staging_dir, exist_ok=True)
+        write_tsv = partial(_write_bulk_tsv, out_dir=self.bulk_staging_dir)
+        total_sessions_processed = 0
         
-        # Page views
-        page_views = session.get('page_views', [])
-        put_commands.append(f"put 'user_sessions', '{row_key}', 'page_views:page_count', '{len(page_views)}'")
+        with multiprocessing.Pool(min(self.num_workers, len(session_files)),
+                                  initializer=_init_worker_logging, initargs=(_log_queue,)) as pool:
+            for tsv_path, sessions_processed in tqdm(pool.imap_unordered(write_tsv, session_files),
+                                                     total=len(session_files), desc="Writing bulk TSV files"):
+                total_sessions_processed += sessions_processed
         
-        if page_views:
-            put_commands.append(f"put 'user_sessions', '{row_key}', 'page_views:first_page', '{page_views[0].get('page_type', '')}'")
-            put_commands.append(f"put 'user_sessions', '{row_key}', 'page_views:last_page', '{page_views[-1].get('page_type', '')}'")
+        if not total_sessions_processed:
+            return 0, 0
         
-        # Conversion data
-        viewed_products = session.get('viewed_products', [])
-        put_commands.append(f"put 'user_sessions', '{row_key}', 'conversion_data:products_viewed', '{len(viewed_products)}'")
+        tsv_dir = f"{self.bulk_hdfs_dir}/tsv"
+        hfile_dir = f"{self.bulk_hdfs_dir}/hfiles"
+        fs_shell = ['hbase', 'org.apache.hadoop.fs.FsShell']
         
-        cart_contents = session.get('cart_contents', {})
-        put_commands.append(f"put 'user_sessions', '{row_key}', 'conversion_data:cart_items', '{len(cart_contents)}'")
+        try:
+            # Stage the TSVs in HDFS; ImportTsv refuses to write into an existing output dir
+            subprocess.run(['docker', 'cp', self.bulk_staging_dir, 'ecommerce_hbase_master:/tmp/bulk_tsv'],
+                           check=True, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+            self._run_in_hbase_master(fs_shell + ['-rm', '-r', '-f', self.bulk_hdfs_dir])
+            self._run_in_hbase_master(fs_shell + ['-mkdir', '-p', self.bulk_hdfs_dir])
+            self._run_in_hbase_master(fs_shell + ['-put', '/tmp/bulk_tsv', tsv_dir])
+            
+            logger.info(" Generating HFiles with ImportTsv...")
+            self._run_in_hbase_master([
+                'hbase', 'org.apache.hadoop.hbase.mapreduce.ImportTsv',
+                f"-Dimporttsv.columns=HBASE_ROW_KEY,{','.join(_BULK_COLUMNS)}",
+                f"-Dimporttsv.bulk.output={hfile_dir}",
+                '-Dimporttsv.skip.empty.columns=true',
+                'user_sessions', tsv_dir
+            ])
+            
+            logger.info(" Linking HFiles into user_sessions...")
+            self._run_in_hbase_master(['hbase', 'completebulkload', hfile_dir, 'user_sessions'])
+            
+        except subprocess.CalledProcessError as e:
+            logger.error(f" Bulk load step failed: {e.stderr}")
+            return 0, 0
         
-        return row_key, put_commands
+        finally:
+            self._run_in_hbase_master(['rm', '-rf', '/tmp/bulk_tsv'], check=False)
         
-        return row_key, put_commands
+        # Each TSV line becomes one row of HFile cells
+        return total_sessions_processed, total_sessions_processed
+
+    def _run_in_hbase_master(self, args: List[str], check: bool = True) -> subprocess.CompletedProcess:
+        """Run a command inside the hbase-master container"""
+        cmd = ['docker', 'compose', '-f', self.docker_compose_path, 'exec', '-T', 'hbase-master'] + args
+        # Only stderr is ever read (on failure); MapReduce progress on stdout is discarded
+        return subprocess.run(cmd, check=check, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+                              text=True, timeout=1800)
+
+    def _start_shell(self) -> subprocess.Popen:
+        """Start (or restart) the persistent hbase shell used for batches"""
+        self.shell = subprocess.Popen(
+            ['docker', 'compose', '-f', self.docker_compose_path,
+             'exec', '-T', 'hbase-master', 'hbase', 'shell', '-n'],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,  # Interleave errors so reading to the sentinel also drains them
+            bufsize=1,
+            text=True
+        )
+        # Output of the preamble is drained along with the first batch
+        self.shell.stdin.write("\n".join(_SHELL_PREAMBLE) + "\n")
+        self.shell.stdin.flush()
+        return self.shell
+
+    def _close_shell(self):
+        """Exit the persistent hbase shell if it is running"""
+        if self.shell and self.shell.poll() is None:
+            try:
+                self.shell.stdin.write('exit\n')
+                self.shell.stdin.flush()
+                self.shell.wait(timeout=30)
+            except Exception:
+                self.shell.kill()
+        self.shell = None
+
+    def _execute_batch_commands(self, commands: List[str]) -> bool:
+        """Execute a batch of HBase commands on the persistent shell"""
+        try:
+            shell = self.shell if self.shell and self.shell.poll() is None else self._start_shell()
+            
+            # Stream the batch, then wait for the sentinel so we know every put has run
+            shell.stdin.write("\n".join(commands) + f"\nputs '{SHELL_BATCH_SENTINEL}'\n")
+            shell.stdin.flush()
+            
+            errors = []
+            for line in shell.stdout:
+                line = line.strip()
+                if line == SHELL_BATCH_SENTINEL:
+                    break
+                if 'ERROR' in line:
+                    errors.append(line)
+            else:
+                # Non-interactive shell exits on the first failed command; restart it next batch
+                logger.warning(f"⚠️  HBase shell exited during batch: {'; '.join(errors)}")
+                self.shell = None
+                return False
+            
+            if errors:
+                logger.warning(f"⚠️  Batch execution had issues: {'; '.join(errors)}")
+                return False
+            return True
+                
+        except Exception as e:
+            logger.error(f" Failed to execute batch commands: {str(e)}")
+            return False
+
+    def _convert_session_to_hbase_commands(self, session: Dict) -> tuple:
+        """Render a session's columns as one multi-column shell Put"""
+        row_key, columns = _convert_session_to_hbase_columns(session)
+        add_columns = ''.join(_shell_add_column(c) % v.decode('utf-8') for c, v in columns.items())
+        return row_key, [_PUT_ROW % (row_key, add_columns)]
 
     def verify_data_loading(self) -> bool:
         """Verify data was loaded correctly"""
         logger.info("Verifying HBase data loading...")
         
+        if not self.use_shell:
+            try:
+                with self.pool.connection() as connection:
+                    rows = list(connection.table('user_sessions').scan(limit=5))
+                if rows:
+                    logger.info(" Data verification successful - records found in HBase")
+                    return True
+                logger.error(" No records found in user_sessions")
+                return False
+            except Exception as e:
+                logger.error(f" Verification failed: {str(e)}")
+                return False
+        
         try:
             # Create verification script
             verify_script = "scan 'user_sessions', {LIMIT => 5}\nexit\n"
@@ -297,7 +638,7 @@ class HBaseShellLoader:
             try:
                 # Copy to container
                 copy_cmd = ['docker', 'cp', temp_file, 'ecommerce_hbase_master:/tmp/verify.hbase']
-                subprocess.run(copy_cmd, check=True, capture_output=True)
+                subprocess.run(copy_cmd, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
                 
                 # Execute verification
                 cmd = [
@@ -338,18 +679,37 @@ class HBaseShellLoader:
                 ("prod_00005", "2025-06-01", 178, 56, 7)
             ]
             
+            last_updated = datetime.now().isoformat()
+            
+            if not self.use_shell:
+                with self.pool.connection() as connection:
+                    with connection.table('product_views').batch(transaction=False) as batch:
+                        for product_id, date, views, users, conversions in sample_metrics:
+                            batch.put(f"{product_id}_{date}".encode('utf-8'), {
+                                b'view_metrics:view_count': str(views).encode('utf-8'),
+                                b'view_metrics:unique_users': str(users).encode('utf-8'),
+                                b'view_metrics:conversion_count': str(conversions).encode('utf-8'),
+                                b'interaction_data:last_updated': last_updated.encode('utf-8')
+                            })
+                
+                logger.info(" Sample product metrics created")
+                return
+            
+            # One shell batch for every product instead of a shell session per put
+            all_cmds = []
             for product_id, date, views, users, conversions in sample_metrics:
                 row_key = f"{product_id}_{date}"
                 
-                commands = [
+                all_cmds.extend([
                     f"put 'product_views', '{row_key}', 'view_metrics:view_count', '{views}'",
                     f"put 'product_views', '{row_key}', 'view_metrics:unique_users', '{users}'",
                     f"put 'product_views', '{row_key}', 'view_metrics:conversion_count', '{conversions}'",
-                    f"put 'product_views', '{row_key}', 'interaction_data:last_updated', '{datetime.now().isoformat()}'"
-                ]
-                
-                for cmd in commands:
-                    self.execute_hbase_command(cmd)
+                    f"put 'product_views', '{row_key}', 'interaction_data:last_updated', '{last_updated}'"
+                ])
+            
+            if not self._execute_batch_commands(all_cmds):
+                logger.warning("⚠️  Some product metric puts failed")
+                return
             
             logger.info(" Sample product metrics created")
             
@@ -390,13 +750,27 @@ class HBaseShellLoader:
         except Exception as e:
             logger.error(f" Data loading failed: {str(e)}")
             return False
+        
+        finally:
+            if self.pool:
+                close_pool(self.pool)
+                self.pool = None
+            self._close_shell()
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load session data into HBase")
+    parser.add_argument('--fallback', action='store_true',
+                        help="Use HBase shell commands through docker instead of the Thrift server")
+    parser.add_argument('--bulk-load', action='store_true',
+                        help="Generate HFiles with ImportTsv and load them with completebulkload")
+    args = parser.parse_args()
+    
     print("  HBASE SHELL DATA LOADER")
     print("=" * 50)
     
-    loader = HBaseShellLoader()
+    loader = HBaseShellLoader(use_shell=args.fallback, host=os.environ.get('HBASE_HOST', 'localhost'),
+                              bulk_load=args.bulk_load)
     success = loader.run_complete_loading()
     
     if success:
@@ -5,14 +5,26 @@ AUCA Big Data Analytics Final Project
 Professional MongoDB schema creation and data loading with optimizations
 """
 
-import json
+import argparse
+import asyncio
+import glob
+import mmap
 import os
 import logging
-from typing import Dict, List, Any
-from datetime import datetime
-from pymongo import MongoClient, ASCENDING, DESCENDING, TEXT
+import threading
+from collections import Counter
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from itertools import chain, islice
+from typing import Dict, Iterator, List, Any
+import bson
+from bson.raw_bson import RawBSONDocument
+from pymongo import MongoClient, IndexModel, ASCENDING, DESCENDING, TEXT
 from pymongo.errors import BulkWriteError, DuplicateKeyError
+from motor.motor_asyncio import AsyncIOMotorClient
 from tqdm import tqdm
+import pandas as pd
+import ijson
+import orjson
 import sys
 
 # Configure logging
@@ -29,11 +41,36 @@ logger = logging.getLogger(__name__)
 class MongoDBSetup:
     """Professional MongoDB setup with schemas, indexes, and data loading"""
     
-    def __init__(self, connection_string: str = "mongodb://localhost:27017/"):
+    def __init__(self, connection_string: str = "mongodb://localhost:27017/", bulk_load: bool = True,
+                 strict_counts: bool = False):
         self.connection_string = connection_string
         self.client = None
         self.db = None
+        self.collections = {}
+        self._schemas = {}  # Validators applied by apply_validation_schemas after the load
         self.db_name = "ecommerce_analytics"
+        # Exact count_documents scans in verify_data_integrity; otherwise metadata estimates
+        self.strict_counts = strict_counts
+        
+        # Bulk load sends unacknowledged (w=0) inserts, which never report write errors; the
+        # load is a one-shot re-runnable import, and verify_data_integrity compares an exact
+        # count of each collection against the documents sent.
+        # Validators are only attached after the load, so inserts skip validation without
+        # bypass_document_validation, which PyMongo rejects on unacknowledged writes
+        self.bulk_load = bulk_load
+        self.load_db = None
+        
+        # Batches are inserted concurrently; PyMongo releases the GIL while waiting on the socket
+        self.insert_workers = 16
+        self.max_inflight_batches = 32  # Bounds memory held by queued batches
+        self._executor = None
+        self._inflight = None
+        self._stats_lock = threading.Lock()
+        self.write_errors = Counter()  # Only acknowledged (bulk_load=False) writes report these
+        self.records_sent = Counter()  # Documents handed to insert_many, per collection
+        self.failed_session_files = []
+        self.batch_sizes = {}  # Per-collection batch size, from sampled document sizes
+        self.whole_file_decode_limit = 64 * 1024 * 1024  # Larger files are streamed instead
         
         # Ensure log directory exists
         os.makedirs("mongodb/logs", exist_ok=True)
@@ -43,10 +80,16 @@ class MongoDBSetup:
     def connect(self) -> bool:
         """Establish MongoDB connection with error handling"""
         try:
-            self.client = MongoClient(self.connection_string, serverSelectionTimeoutMS=5000)
+            # Pool sized above insert_workers so concurrent batches never wait for a socket
+            self.client = MongoClient(self.connection_string, serverSelectionTimeoutMS=5000, maxPoolSize=64)
             # Test connection
             self.client.server_info()
             self.db = self.client[self.db_name]
+            # Collection handles are resolved once and shared by every phase
+            self.collections = {
+                name: self.db[name]
+                for name in ["users", "products", "transactions", "categories", "sessions"]
+            }
             logger.info(f" Connected to MongoDB at {self.connection_string}")
             logger.info(f" Using database: {self.db_name}")
             return True
@@ -55,8 +98,8 @@ class MongoDBSetup:
             return False
 
     def create_collections_with_schemas(self):
-        """Create collections with JSON Schema validation"""
-        logger.info("🏗️  Creating collections with validation schemas...")
+        """Create collections and record their JSON Schemas for validation after the load"""
+        logger.info("🏗️  Creating collections...")
         
         # Users collection with schema validation
         users_schema = {
@@ -200,36 +243,28 @@ class MongoDBSetup:
             }
         }
 
-        # Create collections with validation
-        collections_config = {
+        # Validators are attached after the load so the server does not evaluate them per insert
+        self._schemas = {
             "users": users_schema,
             "products": products_schema,
             "transactions": transactions_schema,
             "categories": categories_schema
         }
 
-        for collection_name, schema in collections_config.items():
+        for collection_name in self._schemas:
             try:
                 # Drop collection if exists
-                self.db[collection_name].drop()
+                self.collections[collection_name].drop()
                 
-                # Create collection with validation
-                self.db.create_collection(
-                    collection_name,
-                    validator=schema,
-                    validationLevel="moderate",  # Allow some flexibility during development
-                    validationAction="warn"       # Log validation errors but allow inserts
-                )
-                logger.info(f" Created collection '{collection_name}' with schema validation")
+                self.db.create_collection(collection_name)
+                logger.info(f" Created collection '{collection_name}'")
                 
             except Exception as e:
                 logger.error(f" Failed to create collection '{collection_name}': {str(e)}")
 
-    def create_indexes(self):
-        """Create performance-optimized indexes for analytics queries"""
-        logger.info(" Creating performance indexes...")
-        
-        index_configs = {
+    def _index_configs(self) -> Dict[str, List]:
+        """Index specs per collection, used by create_unique_indexes and create_analytics_indexes"""
+        return {
             "users": [
                 # Primary indexes
                 [("user_id", ASCENDING)],  # Unique index
@@ -310,40 +345,69 @@ class MongoDBSetup:
                 
                 # Subcategory index
                 [("subcategories.subcategory_id", ASCENDING)]
+            ],
+            
+            "sessions": [
+                [("session_id", ASCENDING)],  # Unique index
+                [("user_id", ASCENDING)],
+                [("start_time", DESCENDING)],
+                [("conversion_status", ASCENDING)]
             ]
         }
 
-        for collection_name, indexes in index_configs.items():
-            collection = self.db[collection_name]
+    def _is_unique_index(self, collection_name: str, index_spec: List) -> bool:
+        """Whether an index spec is one of the unique identifier indexes"""
+        unique_fields = {
+            "users": ["user_id", "email"],
+            "products": ["product_id", "sku"],
+            "transactions": ["transaction_id"],
+            "categories": ["category_id"],
+            "sessions": ["session_id"]
+        }
+        return len(index_spec) == 1 and index_spec[0][0] in unique_fields.get(collection_name, [])
+
+    def _index_name(self, index_spec: List) -> str:
+        """Index name built from the spec's fields and directions"""
+        return "_".join([f"{field}_{direction}" for field, direction in index_spec])[:63]  # MongoDB index name limit
+
+    def create_unique_indexes(self):
+        """Create the unique identifier indexes before loading so duplicates are rejected on insert"""
+        logger.info(" Creating unique indexes...")
+        
+        for collection_name, indexes in self._index_configs().items():
+            models = [
+                IndexModel(index_spec, unique=True, name=self._index_name(index_spec))
+                for index_spec in indexes
+                if self._is_unique_index(collection_name, index_spec)
+            ]
             
-            for index_spec in indexes:
-                try:
-                    # Create index with appropriate options
-                    index_name = "_".join([f"{field}_{direction}" for field, direction in index_spec])
-                    
-                    # Handle unique indexes
-                    unique = False
-                    if collection_name == "users" and index_spec[0][0] in ["user_id", "email"]:
-                        unique = True
-                    elif collection_name == "products" and index_spec[0][0] in ["product_id", "sku"]:
-                        unique = True
-                    elif collection_name == "transactions" and index_spec[0][0] == "transaction_id":
-                        unique = True
-                    elif collection_name == "categories" and index_spec[0][0] == "category_id":
-                        unique = True
-                    
-                    # Create the index
-                    result = collection.create_index(
-                        index_spec,
-                        unique=unique,
-                        background=True,  # Non-blocking index creation
-                        name=index_name[:63]  # MongoDB index name limit
-                    )
-                    
-                    logger.info(f" Created index '{result}' on {collection_name}")
-                    
-                except Exception as e:
-                    logger.warning(f"⚠️  Index creation warning for {collection_name}: {str(e)}")
+            try:
+                # One call builds every unique index of the collection together
+                result = self.collections[collection_name].create_indexes(models)
+                logger.info(f" Created unique indexes {result} on {collection_name}")
+                
+            except Exception as e:
+                logger.warning(f"⚠️  Index creation warning for {collection_name}: {str(e)}")
+
+    def create_analytics_indexes(self):
+        """Create the secondary analytics indexes once the data is loaded"""
+        logger.info(" Creating performance indexes...")
+        
+        for collection_name, indexes in self._index_configs().items():
+            # Building after the load lets the server bulk-build each index instead of
+            # updating every b-tree on every insert; one call builds them in a single scan
+            models = [
+                IndexModel(index_spec, name=self._index_name(index_spec))
+                for index_spec in indexes
+                if not self._is_unique_index(collection_name, index_spec)
+            ]
+            
+            try:
+                result = self.collections[collection_name].create_indexes(models)
+                logger.info(f" Created {len(result)} indexes on {collection_name}")
+                
+            except Exception as e:
+                logger.warning(f"⚠️  Index creation warning for {collection_name}: {str(e)}")
 
     def load_data_optimized(self):
         """Load data with optimized batch operations"""
@@ -357,109 +421,237 @@ class MongoDBSetup:
             "transactions": "data/raw/transactions.json"
         }
         
-        # Load main collections
-        for collection_name, file_path in data_files.items():
-            if os.path.exists(file_path):
-                self._load_json_file(collection_name, file_path)
-            else:
-                logger.error(f" File not found: {file_path}")
+        self._executor = ThreadPoolExecutor(max_workers=self.insert_workers, thread_name_prefix="mongo-insert")
+        self._inflight = threading.BoundedSemaphore(self.max_inflight_batches)
+        
+        bulk_client = None
+        if self.bulk_load:
+            bulk_client = MongoClient(self.connection_string, w=0, maxPoolSize=64)
+            self.load_db = bulk_client[self.db_name]
+        else:
+            self.load_db = self.db
+        
+        try:
+            # Load main collections
+            for collection_name, file_path in data_files.items():
+                if os.path.exists(file_path):
+                    self._load_json_file(collection_name, file_path)
+                else:
+                    logger.error(f" File not found: {file_path}")
+            
+            # Load sessions (multiple files)
+            self._load_sessions_files()
+            
+        finally:
+            self._executor.shutdown(wait=True)
+            if bulk_client:
+                bulk_client.close()
+            self.load_db = self.db
         
-        # Load sessions (multiple files)
-        self._load_sessions_files()
+        for collection_name, error_count in self.write_errors.items():
+            logger.warning(f"⚠️  {collection_name}: {error_count:,} documents rejected by bulk writes")
+
+    def _submit_batch(self, insert_fn, *args) -> Future:
+        """Queue a batch insert on the worker pool, blocking while too many batches are in flight"""
+        self._inflight.acquire()
+        future = self._executor.submit(insert_fn, *args)
+        future.add_done_callback(lambda _: self._inflight.release())
+        return future
 
     def _load_json_file(self, collection_name: str, file_path: str):
-        """Load JSON file with batch processing and error handling"""
+        """Stream a JSON array file into a collection in batches"""
         logger.info(f"Loading {collection_name} from {file_path}...")
         
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-            
-            if not data:
-                logger.warning(f"No data found in {file_path}")
-                return
+            collection = self.load_db[collection_name]
             
-            # Convert date strings to datetime objects
-            data = self._convert_dates(data, collection_name)
+            # Batch insert with progress bar; records are streamed so only one batch is held in memory
+            total_read = 0
+            futures = []
             
-            collection = self.db[collection_name]
-            
-            # Batch insert with progress bar
-            batch_size = 1000
-            total_inserted = 0
+            with open(file_path, 'rb') as f, tqdm(desc=f"Loading {collection_name}", unit="docs") as pbar:
+                for batch in self._iter_batches(f, collection_name):
+                    futures.append(self._submit_batch(self._insert_batch, collection, collection_name, batch))
+                    total_read += len(batch)
+                    pbar.update(len(batch))
+                
+                # Wait for this collection's batches before reporting it
+                total_inserted = sum(future.result() for future in futures)
             
-            with tqdm(total=len(data), desc=f"Loading {collection_name}") as pbar:
-                for i in range(0, len(data), batch_size):
-                    batch = data[i:i + batch_size]
-                    
-                    try:
-                        result = collection.insert_many(batch, ordered=False)
-                        total_inserted += len(result.inserted_ids)
-                        pbar.update(len(batch))
-                        
-                    except BulkWriteError as e:
-                        # Handle partial failures
-                        total_inserted += e.details.get('nInserted', 0)
-                        logger.warning(f"Bulk write errors in {collection_name}: {len(e.details.get('writeErrors', []))}")
-                        pbar.update(len(batch))
+            self.records_sent[collection_name] += total_read
+            if not total_read:
+                logger.warning(f"No data found in {file_path}")
+                return
             
-            logger.info(f" Loaded {total_inserted:,} records into {collection_name}")
+            if self.bulk_load:
+                logger.info(f" Sent {total_read:,} records to {collection_name} (unacknowledged, verified after the load)")
+            else:
+                logger.info(f" Loaded {total_inserted:,} records into {collection_name}")
             
         except Exception as e:
             logger.error(f" Failed to load {collection_name}: {str(e)}")
 
+    def _iter_batches(self, f, collection_name: str) -> Iterator[List[Dict]]:
+        """Yield the records of a JSON array file in batches sized for the collection"""
+        records = self._iter_records(f)
+        
+        # Size batches from the first documents so they stay clear of the 16MB message limit
+        sample = list(islice(records, 50))
+        if not sample:
+            return
+        batch_size = self._batch_size_for(collection_name, sample)
+        records = chain(sample, records)
+        
+        # islice fills each batch from the parser in C, with no per-record length check;
+        # every batch is a fresh list because the previous one may still be in flight
+        while True:
+            batch = list(islice(records, batch_size))
+            if not batch:
+                return
+            yield batch
+
+    def _iter_records(self, f) -> Iterator[Dict]:
+        """Decode small files in one orjson call; stream large ones with ijson"""
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:
+            return iter(())
+        if size <= self.whole_file_decode_limit:
+            # orjson parses straight from the mapped pages instead of a copy made by f.read()
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped, memoryview(mapped) as view:
+                return iter(orjson.loads(view))
+        return ijson.items(f, 'item', use_float=True)
+
+    def _batch_size_for(self, collection_name: str, sample: List[Dict]) -> int:
+        """Pick a batch size that keeps each insert_many around 14MB of BSON"""
+        if collection_name in self.batch_sizes:
+            return self.batch_sizes[collection_name]
+        
+        avg_bytes = sum(len(bson.encode(doc)) for doc in sample) / len(sample)
+        batch_size = max(100, min(2000, int(14_000_000 / avg_bytes)))
+        self.batch_sizes[collection_name] = batch_size
+        
+        logger.info(f" {collection_name}: ~{avg_bytes:,.0f} bytes/doc -> {batch_size} docs per batch "
+                    f"(14MB / avg size, clamped to 100-2000)")
+        return batch_size
+
+    def _insert_batch(self, collection, collection_name: str, batch: List[Dict]) -> int:
+        """Convert dates and insert one batch, returning the number of documents inserted (sent, under w=0)"""
+        # Convert date strings to datetime objects
+        self._convert_dates(batch, collection_name)
+        
+        # Encode before insert_many so the pooled socket is only held while bytes are sent;
+        # the server assigns _id to raw documents that lack one
+        encoded = [RawBSONDocument(bson.encode(doc)) for doc in batch]
+        
+        try:
+            # With w=0 this counts documents sent; verify_data_integrity checks what landed
+            collection.insert_many(encoded, ordered=False)
+            return len(encoded)
+            
+        except BulkWriteError as e:
+            return self._record_write_errors(collection_name, e)
+
+    def _record_write_errors(self, collection_name: str, error: BulkWriteError) -> int:
+        """Tally a partial bulk-write failure and return how many documents were still inserted
+
+        Only acknowledged writes raise BulkWriteError; under w=0 rejected documents show up as
+        a shortfall in verify_data_integrity instead.
+        """
+        error_count = len(error.details.get('writeErrors', []))
+        with self._stats_lock:
+            self.write_errors[collection_name] += error_count
+        logger.warning(f"Bulk write errors in {collection_name}: {error_count}")
+        return error.details.get('nInserted', 0)
+
     def _load_sessions_files(self):
         """Load session files (multiple files)"""
         logger.info("Loading session files...")
         
-        # Create sessions collection if not exists
-        if "sessions" not in self.db.list_collection_names():
-            self.db.create_collection("sessions")
+        # Find all session files with one directory listing
+        session_files = sorted(glob.glob("data/raw/sessions_*.json"))
         
-        sessions_collection = self.db["sessions"]
-        
-        # Find all session files
-        session_files = []
-        for i in range(20):  # We know we have sessions_000.json to sessions_019.json
-            file_path = f"data/raw/sessions_{i:03d}.json"
-            if os.path.exists(file_path):
-                session_files.append(file_path)
-        
-        total_sessions = 0
-        for file_path in session_files:
-            try:
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    sessions_data = json.load(f)
-                
-                # Convert dates
-                sessions_data = self._convert_session_dates(sessions_data)
-                
-                # Batch insert
-                batch_size = 1000
-                for i in range(0, len(sessions_data), batch_size):
-                    batch = sessions_data[i:i + batch_size]
-                    try:
-                        sessions_collection.insert_many(batch, ordered=False)
-                        total_sessions += len(batch)
-                    except Exception as e:
-                        logger.warning(f"Session batch insert error: {str(e)}")
-                
-                logger.info(f" Loaded sessions from {os.path.basename(file_path)}")
-                
-            except Exception as e:
-                logger.error(f" Failed to load {file_path}: {str(e)}")
+        # Session loading is many small round trips, so fan out on one event loop
+        self.failed_session_files = []
+        total_sessions = asyncio.run(self._load_sessions_async(session_files))
         
         logger.info(f" Total sessions loaded: {total_sessions:,}")
+        if self.failed_session_files:
+            logger.error(f" {len(self.failed_session_files)} of {len(session_files)} session files failed to load")
+
+    async def _load_sessions_async(self, session_files: List[str]) -> int:
+        """Load every session file concurrently through an asyncio Motor client"""
+        client = AsyncIOMotorClient(self.connection_string, w=0 if self.bulk_load else 1, maxPoolSize=64)
+        
+        try:
+            sessions_collection = client[self.db_name]["sessions"]
+            inflight = asyncio.Semaphore(self.max_inflight_batches)
+            
+            counts = await asyncio.gather(*[
+                self._load_session_file_async(sessions_collection, file_path, inflight)
+                for file_path in session_files
+            ])
+            return sum(counts)
+            
+        finally:
+            client.close()
+
+    async def _load_session_file_async(self, sessions_collection, file_path: str,
+                                       inflight: asyncio.Semaphore) -> int:
+        """Stream one session file, scheduling an insert task per batch"""
+        tasks = []
+        error = None
         
-        # Create indexes for sessions
         try:
-            sessions_collection.create_index([("session_id", ASCENDING)], unique=True)
-            sessions_collection.create_index([("user_id", ASCENDING)])
-            sessions_collection.create_index([("start_time", DESCENDING)])
-            sessions_collection.create_index([("conversion_status", ASCENDING)])
-            logger.info(" Created indexes for sessions collection")
+            # Stream and batch insert
+            with open(file_path, 'rb') as f:
+                for batch in self._iter_batches(f, "sessions"):
+                    tasks.append(await self._schedule_session_batch(sessions_collection, batch, inflight))
+            
         except Exception as e:
-            logger.warning(f"Session index creation warning: {str(e)}")
+            error = e
+        
+        finally:
+            # Runs on the parse-error path too, so every scheduled insert finishes and is retrieved
+            results = await asyncio.gather(*tasks, return_exceptions=True)
+        
+        file_sessions = sum(result for result in results if not isinstance(result, BaseException))
+        failures = [result for result in results if isinstance(result, BaseException)]
+        if error is None and failures:
+            error = failures[0]
+        
+        if error is not None:
+            logger.error(f" Failed to load {file_path}: {str(error)} "
+                         f"({file_sessions:,} sessions from it were already inserted)")
+            self.failed_session_files.append(file_path)
+            return file_sessions
+        
+        logger.info(f" Loaded {file_sessions:,} sessions from {os.path.basename(file_path)}")
+        return file_sessions
+
+    async def _schedule_session_batch(self, sessions_collection, batch: List[Dict],
+                                      inflight: asyncio.Semaphore) -> asyncio.Task:
+        """Start an insert task once a slot is free, then yield so other files can progress"""
+        await inflight.acquire()
+        task = asyncio.create_task(self._insert_session_batch_async(sessions_collection, batch, inflight))
+        # ijson parsing never awaits; give pending inserts and the other files a turn
+        await asyncio.sleep(0)
+        return task
+
+    async def _insert_session_batch_async(self, sessions_collection, batch: List[Dict],
+                                          inflight: asyncio.Semaphore) -> int:
+        """Insert one session batch; any error other than per-document write errors fails the file"""
+        try:
+            self._convert_session_dates(batch)
+            result = await sessions_collection.insert_many(batch, ordered=False)
+            self.records_sent["sessions"] += len(batch)
+            return len(result.inserted_ids)
+            
+        except BulkWriteError as e:
+            self.records_sent["sessions"] += len(batch)
+            return self._record_write_errors("sessions", e)
+            
+        finally:
+            inflight.release()
 
     def _convert_dates(self, data: List[Dict], collection_name: str) -> List[Dict]:
         """Convert ISO date strings to datetime objects"""
@@ -470,79 +662,124 @@ class MongoDBSetup:
             "categories": ["created_date"]
         }
         
-        fields_to_convert = date_fields.get(collection_name, [])
+        for field in date_fields.get(collection_name, []):
+            self._convert_date_field(data, field)
         
-        for record in data:
-            for field in fields_to_convert:
-                if field in record and isinstance(record[field], str):
-                    try:
-                        record[field] = datetime.fromisoformat(record[field].replace('Z', '+00:00'))
-                    except:
-                        pass  # Keep original value if conversion fails
-            
-            # Handle nested date fields
-            if collection_name == "products" and "price_history" in record:
-                for price_entry in record["price_history"]:
-                    if "date" in price_entry and isinstance(price_entry["date"], str):
-                        try:
-                            price_entry["date"] = datetime.fromisoformat(price_entry["date"].replace('Z', '+00:00'))
-                        except:
-                            pass
+        # Handle nested date fields: flatten every price_history entry in the batch into one column
+        if collection_name == "products":
+            price_entries = [entry for record in data for entry in record.get("price_history") or []]
+            self._convert_date_field(price_entries, "date")
         
         return data
 
     def _convert_session_dates(self, sessions_data: List[Dict]) -> List[Dict]:
         """Convert session date strings to datetime objects"""
-        for session in sessions_data:
-            for field in ["start_time", "end_time"]:
-                if field in session and isinstance(session[field], str):
-                    try:
-                        session[field] = datetime.fromisoformat(session[field].replace('Z', '+00:00'))
-                    except:
-                        pass
+        for field in ["start_time", "end_time"]:
+            self._convert_date_field(sessions_data, field)
         return sessions_data
 
-    def verify_data_integrity(self):
-        """Verify data loading and run integrity checks"""
+    def _convert_date_field(self, records: List[Dict], field: str):
+        """Parse one ISO date field across a batch with a single vectorized pd.to_datetime call"""
+        # One dict lookup per record; records and their strings are collected in the same pass
+        targets, values = [], []
+        for record in records:
+            value = record.get(field)
+            if type(value) is str:
+                targets.append(record)
+                values.append(value)
+        if not targets:
+            return
+        
+        parsed = pd.to_datetime(values, utc=True, format='ISO8601', errors='coerce')
+        for record, value in zip(targets, parsed.to_pydatetime()):
+            if value is not pd.NaT:
+                record[field] = value  # Keep original value if conversion fails
+
+    def apply_validation_schemas(self):
+        """Attach the JSON Schema validators to the loaded collections via collMod"""
+        logger.info("🏗️  Applying validation schemas...")
+        
+        for collection_name, schema in self._schemas.items():
+            try:
+                self.db.command({
+                    "collMod": collection_name,
+                    "validator": schema,
+                    "validationLevel": "moderate",  # Allow some flexibility during development
+                    "validationAction": "warn"       # Log validation errors but allow inserts
+                })
+                logger.info(f" Applied schema validation to '{collection_name}'")
+                
+            except Exception as e:
+                logger.error(f" Failed to apply schema to '{collection_name}': {str(e)}")
+
+    def verify_data_integrity(self) -> bool:
+        """Verify data loading and run integrity checks
+
+        Returns False if a collection is empty or holds fewer documents than the load sent,
+        less any rejects the server acknowledged.
+        """
         logger.info("Verifying data integrity...")
         
         collections = ["users", "products", "transactions", "categories", "sessions"]
+        failed_collections = []
         
         for collection_name in collections:
             try:
-                collection = self.db[collection_name]
-                count = collection.count_documents({})
+                collection = self.collections[collection_name]
+                if self.strict_counts:
+                    count = collection.count_documents({})
+                else:
+                    count = collection.estimated_document_count()
                 logger.info(f" {collection_name}: {count:,} documents")
                 
+                # Unacknowledged inserts drop rejects silently, so compare an exact count with what was sent
+                sent = self.records_sent[collection_name]
+                if sent:
+                    expected = sent - self.write_errors[collection_name]
+                    stored = count if self.strict_counts else collection.count_documents({})
+                    if stored < expected:
+                        logger.error(f" {collection_name}: {stored:,} documents stored, "
+                                     f"{expected - stored:,} of {sent:,} sent were lost")
+                        failed_collections.append(collection_name)
+                        continue
+                
                 # Sample document check
                 sample = collection.find_one()
                 if sample:
                     logger.info(f" {collection_name} sample document structure verified")
                 else:
                     logger.warning(f"⚠️  {collection_name} is empty")
+                    failed_collections.append(collection_name)
                     
             except Exception as e:
                 logger.error(f" Error checking {collection_name}: {str(e)}")
+                failed_collections.append(collection_name)
+        
+        if failed_collections:
+            logger.error(f" Data load incomplete for: {', '.join(failed_collections)}")
+            return False
+        return True
 
     def create_sample_aggregations(self):
         """Create and test sample aggregation queries"""
         logger.info("🧪 Testing sample aggregation queries...")
         
-        try:
+        aggregations = {
             # 1. User demographics summary
-            user_demographics = list(self.db.users.aggregate([
+            "User demographics": ("users", "groups", [
+                {"$project": {"demographics.income_bracket": 1, "lifetime_value": 1}},
                 {"$group": {
                     "_id": "$demographics.income_bracket",
                     "count": {"$sum": 1},
                     "avg_lifetime_value": {"$avg": "$lifetime_value"}
                 }},
                 {"$sort": {"count": -1}}
-            ]))
-            logger.info(f" User demographics aggregation: {len(user_demographics)} groups")
+            ]),
             
             # 2. Product performance by category
-            product_performance = list(self.db.products.aggregate([
+            "Product performance": ("products", "categories", [
                 {"$match": {"is_active": True}},
+                {"$project": {"category_id": 1, "base_price": 1, "rating": 1}},
                 {"$group": {
                     "_id": "$category_id",
                     "total_products": {"$sum": 1},
@@ -550,12 +787,12 @@ class MongoDBSetup:
                     "avg_rating": {"$avg": "$rating"}
                 }},
                 {"$sort": {"avg_price": -1}}
-            ]))
-            logger.info(f" Product performance aggregation: {len(product_performance)} categories")
+            ]),
             
             # 3. Revenue by month
-            revenue_by_month = list(self.db.transactions.aggregate([
+            "Revenue": ("transactions", "months", [
                 {"$match": {"status": "completed"}},
+                {"$project": {"timestamp": 1, "total": 1}},
                 {"$group": {
                     "_id": {
                         "year": {"$year": "$timestamp"},
@@ -565,11 +802,26 @@ class MongoDBSetup:
                     "transaction_count": {"$sum": 1}
                 }},
                 {"$sort": {"_id.year": 1, "_id.month": 1}}
-            ]))
-            logger.info(f" Revenue aggregation: {len(revenue_by_month)} months")
+            ])
+        }
+        
+        # The pipelines scan different collections, so run them side by side
+        with ThreadPoolExecutor(max_workers=len(aggregations), thread_name_prefix="mongo-agg") as executor:
+            futures = {
+                executor.submit(self._run_aggregation, collection_name, pipeline): (name, unit)
+                for name, (collection_name, unit, pipeline) in aggregations.items()
+            }
             
-        except Exception as e:
-            logger.error(f" Aggregation test failed: {str(e)}")
+            for future in as_completed(futures):
+                name, unit = futures[future]
+                try:
+                    logger.info(f" {name} aggregation: {len(future.result())} {unit}")
+                except Exception as e:
+                    logger.error(f" {name} aggregation test failed: {str(e)}")
+
+    def _run_aggregation(self, collection_name: str, pipeline: List[Dict]) -> List[Dict]:
+        """Run one aggregation pipeline, letting large $group/$sort stages spill to disk"""
+        return list(self.collections[collection_name].aggregate(pipeline, allowDiskUse=True))
 
     def run_complete_setup(self):
         """Run the complete MongoDB setup process"""
@@ -581,9 +833,12 @@ class MongoDBSetup:
         try:
             # Setup process
             self.create_collections_with_schemas()
-            self.create_indexes()
+            self.create_unique_indexes()
             self.load_data_optimized()
-            self.verify_data_integrity()
+            if not self.verify_data_integrity() or self.failed_session_files:
+                return False
+            self.apply_validation_schemas()
+            self.create_analytics_indexes()
             self.create_sample_aggregations()
             
             logger.info("=" * 60)
@@ -608,10 +863,15 @@ class MongoDBSetup:
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Set up MongoDB and load the e-commerce dataset")
+    parser.add_argument('--strict', action='store_true',
+                        help="Verify with exact count_documents scans instead of collection metadata")
+    args = parser.parse_args()
+    
     print("🍃 MONGODB SETUP & DATA LOADING")
     print("=" * 50)
     
-    setup = MongoDBSetup()
+    setup = MongoDBSetup(strict_counts=args.strict)
     success = setup.run_complete_setup()
     
     if success:
@@ -5,18 +5,37 @@ AUCA Big Data Analytics Final Project
 Generates realistic e-commerce data for MongoDB, HBase, and Spark analytics
 """
 
-import json
 import random
+import sys
 import datetime
-import uuid
 import threading
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import nullcontext
+from functools import partial
 import numpy as np
-from faker import Faker
+import orjson
 import os
-from typing import Dict, List, Any
+from typing import Dict, Iterable, Iterator, List, Any
 from tqdm import tqdm
 import logging
 
+# Mimesis is the faster fake-data backend; Faker is kept as a fallback
+try:
+    from mimesis import Person, Address, Text, Datetime, Internet
+    from mimesis.locales import Locale
+    HAS_MIMESIS = True
+except ImportError:
+    from faker import Faker
+    HAS_MIMESIS = False
+
+# pyarrow is only needed for FORMAT = 'parquet'
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -28,11 +47,42 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Price change logic (realistic market behavior): type weights and the price multiplier range of each
+PRICE_CHANGE_TYPES = ["promotion", "market_adjustment", "cost_increase", "clearance", "restock"]
+PRICE_CHANGE_WEIGHTS = [0.3, 0.25, 0.2, 0.15, 0.1]
+PRICE_CHANGE_FACTORS = np.array([
+    (0.7, 0.9),    # promotion: 10-30% discount
+    (0.9, 1.1),    # market_adjustment: minor adjustment
+    (1.05, 1.25),  # cost_increase: 5-25% increase
+    (0.5, 0.8),    # clearance: 20-50% discount
+    (0.9, 1.1)     # restock: minor adjustment
+])
+
+# Product names are "{adjective} {subcategory} {descriptor}"; the 64 templates are built once
+PRODUCT_NAME_ADJECTIVES = ["Premium", "Professional", "Advanced", "Deluxe", "Essential", "Classic", "Modern", "Ultimate"]
+PRODUCT_NAME_DESCRIPTORS = ["Pro", "Plus", "Elite", "Standard", "Compact", "Extended", "Smart", "Enhanced"]
+PRODUCT_NAME_TEMPLATES = [
+    f"{adjective} {{}} {descriptor}"
+    for adjective in PRODUCT_NAME_ADJECTIVES
+    for descriptor in PRODUCT_NAME_DESCRIPTORS
+]
+
+# orjson encodes datetimes and NumPy scalars natively and never escapes non-ASCII
+JSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY
+PRETTY_JSON_OPTIONS = JSON_OPTIONS | orjson.OPT_INDENT_2
+
+# Product descriptions are sampled from a pool instead of generated per product
+DESCRIPTION_POOL_SIZE = 256
+
+# Seed streams for the datasets generated in worker processes
+SEED_STREAM_USERS = 0
+SEED_STREAM_SESSIONS = 1
+
 class EcommerceDataGenerator:
     """Professional e-commerce dataset generator with realistic business patterns"""
     
-    def __init__(self):
-        self.fake = Faker()
+    def __init__(self, seed: int = 42):
+        self.seed = seed
         
         # Configuration for realistic scale
         self.config = {
@@ -42,26 +92,100 @@ class EcommerceDataGenerator:
             'NUM_TRANSACTIONS': 50000,
             'NUM_SESSIONS': 200000,
             'TIMESPAN_DAYS': 90,
-            'CHUNK_SIZE': 10000
+            'CHUNK_SIZE': 10000,
+            'SHARD_SIZE': 1000,  # Users per worker task
+            'WORKERS': os.cpu_count() or 1,
+            'PRETTY_JSON': False,  # Indent the dataset files; the loaders do not need it
+            'FORMAT': 'json'  # 'parquet' writes the main datasets as zstd Parquet; the loaders read JSON
         }
         
         # Set seeds for reproducibility
-        np.random.seed(42)
-        random.seed(42)
-        Faker.seed(42)
+        np.random.seed(seed)
+        random.seed(seed)
+        self.rng = np.random.default_rng(seed)  # Column-wise draws for the per-row scalar fields
+        self._init_fake_data(seed=seed)
+        
+        # Reference point for all generated timestamps
+        self.now = datetime.datetime.now()
         
         # Initialize data containers
         self.categories = []
         self.products = []
         self.users = []
-        self.sessions = []
+        # Sessions are streamed to disk as they are generated; only their totals are kept
+        self.session_count = 0
+        self.session_start_min = None
+        self.session_end_max = None
         self.transactions = []
+        # Transaction totals for the summary, accumulated as transactions are generated
+        self.total_revenue = 0.0
+        self.discounted_transactions = 0
         
         # Ensure output directory exists
         os.makedirs("data/raw", exist_ok=True)
         
         logger.info("EcommerceDataGenerator initialized with professional settings")
 
+    def _init_fake_data(self, seed: int):
+        """Bind the per-row fake-data callables to Mimesis providers, or to Faker if unavailable"""
+        if HAS_MIMESIS:
+            person = Person(Locale.EN, seed=seed)
+            address = Address(Locale.EN, seed=seed)
+            text = Text(Locale.EN, seed=seed)
+            dates = Datetime(Locale.EN, seed=seed)
+            internet = Internet(seed=seed)
+            
+            self.fake_email = person.email
+            self.fake_first_name = person.first_name
+            self.fake_last_name = person.last_name
+            self.fake_job = person.occupation
+            self.fake_city = address.city
+            self.fake_state_abbr = partial(address.state, abbr=True)
+            self.fake_zipcode = address.zip_code
+            self.fake_timezone = dates.timezone
+            self.fake_ipv4 = internet.ip_v4
+            self.fake_description = lambda: text.text(quantity=2)[:250]
+        else:
+            fake = Faker()
+            Faker.seed(seed)
+            
+            self.fake_email = fake.email
+            self.fake_first_name = fake.first_name
+            self.fake_last_name = fake.last_name
+            self.fake_job = fake.job
+            self.fake_city = fake.city
+            self.fake_state_abbr = fake.state_abbr
+            self.fake_zipcode = fake.zipcode
+            self.fake_timezone = fake.timezone
+            self.fake_ipv4 = fake.ipv4
+            self.fake_description = partial(fake.text, max_nb_chars=250)
+        
+        logger.info(f"Fake data backend: {'mimesis' if HAS_MIMESIS else 'faker'}")
+
+    def _shard_seed(self, stream: int, shard: int) -> int:
+        """Independent, reproducible seed for one shard of a dataset generated in a worker"""
+        return int(np.random.SeedSequence([self.seed, stream, shard]).generate_state(1)[0])
+
+    def _random_datetime(self, start: datetime.datetime, end: datetime.datetime) -> datetime.datetime:
+        """Uniformly random datetime between start and end"""
+        return start + datetime.timedelta(seconds=random.uniform(0, (end - start).total_seconds()))
+
+    def _random_timestamps(self, count: int, start: datetime.datetime, end: datetime.datetime) -> np.ndarray:
+        """Draw count uniformly random second-resolution datetime64 timestamps between start and end"""
+        low = np.datetime64(start, 's')
+        span = int((np.datetime64(end, 's') - low) / np.timedelta64(1, 's'))
+        return low + self.rng.integers(0, span, count).astype('timedelta64[s]')
+
+    def _choose(self, pool: List, size: int, p: List[float] = None) -> List:
+        """Draw size values from pool, reusing the pool's (interned) objects for every row"""
+        # rng.choice on the values would allocate a fresh str per row when converted back to Python
+        pool = [sys.intern(value) if type(value) is str else value for value in pool]
+        return [pool[k] for k in self.rng.choice(len(pool), size, p=p).tolist()]
+
+    def _days_ago(self, days: int) -> datetime.datetime:
+        """Datetime the given number of days before generation started"""
+        return self.now - datetime.timedelta(days=days)
+
     def generate_categories(self) -> List[Dict[str, Any]]:
         """Generate realistic product categories"""
         logger.info("Generating categories with business hierarchy...")
@@ -86,7 +210,7 @@ class EcommerceDataGenerator:
                 "name": main_cat,
                 "description": f"Premium {main_cat.lower()} products for modern lifestyle",
                 "is_active": random.choices([True, False], weights=[0.95, 0.05])[0],
-                "created_date": self.fake.date_time_between(start_date='-2y', end_date='-1y').isoformat(),
+                "created_date": self._random_datetime(self._days_ago(730), self._days_ago(365)).isoformat(),
                 "subcategories": []
             }
             
@@ -128,53 +252,84 @@ class EcommerceDataGenerator:
             "Clothing": ["StyleCo", "FashionForward", "UrbanWear", "ClassicStyle", "ModernFit"],
             "Home & Garden": ["HomeComfort", "LivingStyle", "GardenPro", "DecorPlus", "CozyHome"]
         }
+        default_brands = ["GenericBrand", "QualityMaker", "ReliableCorp"]
         
-        product_creation_start = datetime.datetime.now() - datetime.timedelta(days=self.config['TIMESPAN_DAYS']*2)
+        # SKU prefix of every brand, computed once
+        brand_prefixes = {
+            brand: brand[:3].upper()
+            for brands in [*brands_by_category.values(), default_brands]
+            for brand in brands
+        }
         
-        for prod_id in tqdm(range(self.config['NUM_PRODUCTS']), desc="Creating products"):
-            category = random.choice(self.categories)
+        product_creation_start = self._days_ago(self.config['TIMESPAN_DAYS']*2)
+        
+        # Draw each scalar column for all products at once; the loop only indexes into them
+        n = self.config['NUM_PRODUCTS']
+        rng = self.rng
+        category_idx = rng.integers(0, len(self.categories), n)
+        category_ranges = np.array([price_ranges.get(c["name"], (10, 100)) for c in self.categories])
+        base_prices = np.round(rng.uniform(category_ranges[category_idx, 0], category_ranges[category_idx, 1]), 2).tolist()
+        stocks = rng.integers(0, 1001, n).tolist()
+        reorder_levels = rng.integers(10, 51, n).tolist()
+        weights = np.round(rng.uniform(0.1, 25.0, n), 2).tolist()
+        lengths = np.round(rng.uniform(5, 120, n), 1).tolist()
+        widths = np.round(rng.uniform(5, 80, n), 1).tolist()
+        heights = np.round(rng.uniform(2, 40, n), 1).tolist()
+        is_active = (rng.random(n) < 0.92).tolist()
+        ratings = np.round(rng.uniform(1.0, 5.0, n), 1).tolist()
+        review_counts = rng.integers(0, 501, n).tolist()
+        seasonal = (rng.random(n) < 0.5).tolist()
+        featured = (rng.random(n) < 0.1).tolist()
+        sku_numbers = rng.integers(100000, 1000000, n).tolist()
+        name_templates = rng.integers(0, len(PRODUCT_NAME_TEMPLATES), n).tolist()
+        description_idx = rng.integers(0, DESCRIPTION_POOL_SIZE, n).tolist()
+        category_idx = category_idx.tolist()
+        
+        descriptions = [self.fake_description() for _ in range(DESCRIPTION_POOL_SIZE)]
+        
+        # Generate price history (market fluctuations)
+        price_histories = self._generate_price_histories(base_prices, product_creation_start)
+        
+        for prod_id in tqdm(range(n), desc="Creating products"):
+            category = self.categories[category_idx[prod_id]]
             subcategory = random.choice(category["subcategories"])
             
             # Price based on category
             cat_name = category["name"]
-            min_price, max_price = price_ranges.get(cat_name, (10, 100))
-            base_price = round(random.uniform(min_price, max_price), 2)
-            
-            # Generate price history (market fluctuations)
-            price_history = self._generate_price_history(base_price, product_creation_start)
+            price_history = price_histories[prod_id]
             current_price = price_history[-1]["price"]
             
             # Brand selection
-            available_brands = brands_by_category.get(cat_name, ["GenericBrand", "QualityMaker", "ReliableCorp"])
+            available_brands = brands_by_category.get(cat_name, default_brands)
             brand = random.choice(available_brands)
             
             product = {
                 "product_id": f"prod_{prod_id:05d}",
-                "sku": f"{brand[:3].upper()}-{random.randint(100000, 999999)}",
-                "name": self._generate_product_name(category["name"], subcategory["name"]),
-                "description": self.fake.text(max_nb_chars=250),
+                "sku": f"{brand_prefixes[brand]}-{sku_numbers[prod_id]}",
+                "name": PRODUCT_NAME_TEMPLATES[name_templates[prod_id]].format(subcategory["name"]),
+                "description": descriptions[description_idx[prod_id]],
                 "category_id": category["category_id"],
                 "subcategory_id": subcategory["subcategory_id"],
                 "brand": brand,
                 "base_price": current_price,
                 "cost": round(current_price * (1 - subcategory["profit_margin"]), 2),
-                "current_stock": random.randint(0, 1000),
-                "reorder_level": random.randint(10, 50),
-                "weight_kg": round(random.uniform(0.1, 25.0), 2),
+                "current_stock": stocks[prod_id],
+                "reorder_level": reorder_levels[prod_id],
+                "weight_kg": weights[prod_id],
                 "dimensions": {
-                    "length_cm": round(random.uniform(5, 120), 1),
-                    "width_cm": round(random.uniform(5, 80), 1),
-                    "height_cm": round(random.uniform(2, 40), 1)
+                    "length_cm": lengths[prod_id],
+                    "width_cm": widths[prod_id],
+                    "height_cm": heights[prod_id]
                 },
-                "is_active": random.choices([True, False], weights=[0.92, 0.08])[0],
-                "rating": round(random.uniform(1.0, 5.0), 1),
-                "review_count": random.randint(0, 500),
+                "is_active": is_active[prod_id],
+                "rating": ratings[prod_id],
+                "review_count": review_counts[prod_id],
                 "price_history": price_history,
                 "creation_date": price_history[0]["date"],
                 "last_updated": price_history[-1]["date"],
                 "tags": self._generate_product_tags(),
-                "seasonal": random.choice([True, False]),
-                "featured": random.choices([True, False], weights=[0.1, 0.9])[0]
+                "seasonal": seasonal[prod_id],
+                "featured": featured[prod_id]
             }
             
             self.products.append(product)
@@ -182,60 +337,45 @@ class EcommerceDataGenerator:
         logger.info(f"Generated {len(self.products)} products with realistic market data")
         return self.products
 
-    def _generate_price_history(self, base_price: float, start_date: datetime.datetime) -> List[Dict]:
-        """Generate realistic price fluctuation history"""
-        price_history = []
-        current_price = base_price
-        current_date = start_date
-        
-        # Initial price
-        price_history.append({
-            "price": base_price,
-            "date": current_date.isoformat(),
-            "reason": "initial_listing"
-        })
-        
-        # Generate 0-4 price changes (market dynamics)
-        num_changes = random.randint(0, 4)
-        for _ in range(num_changes):
-            # Time between price changes
-            days_forward = random.randint(7, 45)
-            current_date += datetime.timedelta(days=days_forward)
-            
-            # Price change logic (realistic market behavior)
-            change_type = random.choices(
-                ["promotion", "market_adjustment", "cost_increase", "clearance", "restock"],
-                weights=[0.3, 0.25, 0.2, 0.15, 0.1]
-            )[0]
-            
-            if change_type == "promotion":
-                change_factor = random.uniform(0.7, 0.9)  # 10-30% discount
-            elif change_type == "clearance":
-                change_factor = random.uniform(0.5, 0.8)  # 20-50% discount
-            elif change_type == "cost_increase":
-                change_factor = random.uniform(1.05, 1.25)  # 5-25% increase
-            else:
-                change_factor = random.uniform(0.9, 1.1)  # Minor adjustment
-            
-            current_price = round(current_price * change_factor, 2)
-            
-            price_history.append({
-                "price": current_price,
-                "date": current_date.isoformat(),
-                "reason": change_type
-            })
-        
-        return price_history
-
-    def _generate_product_name(self, category: str, subcategory: str) -> str:
-        """Generate realistic product names"""
-        adjectives = ["Premium", "Professional", "Advanced", "Deluxe", "Essential", "Classic", "Modern", "Ultimate"]
-        descriptors = ["Pro", "Plus", "Elite", "Standard", "Compact", "Extended", "Smart", "Enhanced"]
-        
-        adjective = random.choice(adjectives)
-        descriptor = random.choice(descriptors)
-        
-        return f"{adjective} {subcategory} {descriptor}"
+    def _generate_price_histories(self, base_prices: List[float], start_date: datetime.datetime) -> List[List[Dict]]:
+        """Generate realistic price fluctuation histories for every product at once"""
+        rng = self.rng
+        
+        # Generate 0-4 price changes per product (market dynamics), drawn as one flat array
+        num_changes = rng.integers(0, 5, len(base_prices))
+        total_changes = int(num_changes.sum())
+        days_forward = rng.integers(7, 46, total_changes)  # Time between price changes
+        change_types = rng.choice(len(PRICE_CHANGE_TYPES), total_changes, p=PRICE_CHANGE_WEIGHTS)
+        factor_ranges = PRICE_CHANGE_FACTORS[change_types]
+        change_factors = rng.uniform(factor_ranges[:, 0], factor_ranges[:, 1]).tolist()
+        reasons = [PRICE_CHANGE_TYPES[t] for t in change_types.tolist()]
+        
+        # Days since listing: a running sum of the gaps that restarts at each product
+        running_days = np.cumsum(days_forward)
+        segment_base = np.concatenate(([0], running_days))[np.cumsum(num_changes) - num_changes]
+        days_listed = running_days - np.repeat(segment_base, num_changes)
+        change_dates = np.datetime_as_string(
+            np.datetime64(start_date, 'us') + days_listed.astype('timedelta64[D]'), unit='us'
+        ).tolist()
+        
+        initial_date = start_date.isoformat()
+        price_histories = []
+        position = 0
+        
+        for base_price, count in zip(base_prices, num_changes.tolist()):
+            current_price = base_price
+            
+            # Initial price
+            price_history = [{"price": base_price, "date": initial_date, "reason": "initial_listing"}]
+            
+            for k in range(position, position + count):
+                current_price = round(current_price * change_factors[k], 2)
+                price_history.append({"price": current_price, "date": change_dates[k], "reason": reasons[k]})
+            
+            position += count
+            price_histories.append(price_history)
+        
+        return price_histories
 
     def _generate_product_tags(self) -> List[str]:
         """Generate relevant product tags"""
@@ -250,6 +390,29 @@ class EcommerceDataGenerator:
         """Generate diverse user profiles with realistic demographics"""
         logger.info("Generating user profiles with demographic data...")
         
+        # Users are generated in fixed-size shards, each in a worker process with its own seed,
+        # so the output does not depend on the number of workers
+        n = self.config['NUM_USERS']
+        shard_size = self.config['SHARD_SIZE']
+        shards = [(start, min(shard_size, n - start)) for start in range(0, n, shard_size)]
+        
+        with ProcessPoolExecutor(max_workers=self.config['WORKERS']) as executor:
+            futures = [
+                executor.submit(_generate_user_shard, self._shard_seed(SEED_STREAM_USERS, shard),
+                                start, count, self.config, self.now, self.categories)
+                for shard, (start, count) in enumerate(shards)
+            ]
+            # Collected in submission order so user ids stay sequential
+            for future in tqdm(futures, desc="Creating users"):
+                self.users.extend(future.result())
+        
+        logger.info(f"Generated {len(self.users)} diverse user profiles")
+        return self.users
+
+    def _build_users(self, start: int, count: int) -> List[Dict[str, Any]]:
+        """Generate the users with ids start to start + count - 1"""
+        users = []
+        
         # Realistic demographic distributions
         age_groups = [(18, 25), (26, 35), (36, 45), (46, 55), (56, 70)]
         age_weights = [0.15, 0.30, 0.25, 0.20, 0.10]
@@ -257,76 +420,77 @@ class EcommerceDataGenerator:
         income_brackets = ["low", "medium", "high", "premium"]
         income_weights = [0.25, 0.40, 0.25, 0.10]
         
-        for user_id in tqdm(range(self.config['NUM_USERS']), desc="Creating users"):
-            # Demographics
-            age_range = random.choices(age_groups, weights=age_weights)[0]
-            age = random.randint(*age_range)
-            
-            income_bracket = random.choices(income_brackets, weights=income_weights)[0]
-            
-            reg_date = self.fake.date_time_between(
-                start_date=f"-{self.config['TIMESPAN_DAYS']*3}d",
-                end_date=f"-{self.config['TIMESPAN_DAYS']}d"
+        # Draw each scalar column for the whole shard at once; the loop only indexes into them
+        n = count
+        rng = self.rng
+        age_group = rng.choice(len(age_groups), n, p=age_weights)
+        age_bounds = np.array(age_groups)
+        ages = rng.integers(age_bounds[age_group, 0], age_bounds[age_group, 1] + 1).tolist()
+        income = self._choose(income_brackets, n, p=income_weights)
+        genders = self._choose(["M", "F", "Other"], n)
+        education = self._choose(["high_school", "bachelor", "master", "phd", "other"], n)
+        marital = self._choose(["single", "married", "divorced", "widowed"], n)
+        countries = self._choose(["US", "CA", "UK", "DE", "FR"], n, p=[0.6, 0.15, 0.1, 0.08, 0.07])
+        preferred_counts = rng.integers(1, 6, n).tolist()
+        comm_email = (rng.random(n) < 0.8).tolist()
+        comm_sms = (rng.random(n) < 0.6).tolist()
+        marketing = (rng.random(n) < 0.7).tolist()
+        languages = self._choose(["en", "es", "fr", "de"], n, p=[0.7, 0.15, 0.1, 0.05])
+        statuses = self._choose(["active", "inactive", "suspended"], n, p=[0.85, 0.14, 0.01])
+        tiers = self._choose(["bronze", "silver", "gold", "platinum"], n, p=[0.6, 0.25, 0.12, 0.03])
+        
+        active_category_ids = [cat["category_id"] for cat in self.categories if cat["is_active"]]
+        
+        for i in range(n):
+            user_id = start + i
+            reg_date = self._random_datetime(
+                self._days_ago(self.config['TIMESPAN_DAYS']*3),
+                self._days_ago(self.config['TIMESPAN_DAYS'])
             )
             
             user = {
                 "user_id": f"user_{user_id:06d}",
-                "email": self.fake.email(),
-                "first_name": self.fake.first_name(),
-                "last_name": self.fake.last_name(),
+                "email": self.fake_email(),
+                "first_name": self.fake_first_name(),
+                "last_name": self.fake_last_name(),
                 "demographics": {
-                    "age": age,
-                    "gender": random.choice(["M", "F", "Other"]),
-                    "income_bracket": income_bracket,
-                    "education": random.choice(["high_school", "bachelor", "master", "phd", "other"]),
-                    "occupation": self.fake.job(),
-                    "marital_status": random.choice(["single", "married", "divorced", "widowed"])
+                    "age": ages[i],
+                    "gender": genders[i],
+                    "income_bracket": income[i],
+                    "education": education[i],
+                    "occupation": self.fake_job(),
+                    "marital_status": marital[i]
                 },
                 "geo_data": {
-                    "city": self.fake.city(),
-                    "state": self.fake.state_abbr(),
-                    "country": random.choices(["US", "CA", "UK", "DE", "FR"], weights=[0.6, 0.15, 0.1, 0.08, 0.07])[0],
-                    "timezone": self.fake.timezone(),
-                    "postal_code": self.fake.zipcode()
+                    "city": self.fake_city(),
+                    "state": self.fake_state_abbr(),
+                    "country": countries[i],
+                    "timezone": self.fake_timezone(),
+                    "postal_code": self.fake_zipcode()
                 },
                 "preferences": {
-                    "preferred_categories": random.sample(
-                        [cat["category_id"] for cat in self.categories if cat["is_active"]], 
-                        k=random.randint(1, 5)
-                    ),
-                    "communication_email": random.choices([True, False], weights=[0.8, 0.2])[0],
-                    "communication_sms": random.choices([True, False], weights=[0.6, 0.4])[0],
-                    "marketing_consent": random.choices([True, False], weights=[0.7, 0.3])[0],
-                    "language": random.choices(["en", "es", "fr", "de"], weights=[0.7, 0.15, 0.1, 0.05])[0]
+                    "preferred_categories": random.sample(active_category_ids, k=preferred_counts[i]),
+                    "communication_email": comm_email[i],
+                    "communication_sms": comm_sms[i],
+                    "marketing_consent": marketing[i],
+                    "language": languages[i]
                 },
                 "registration_date": reg_date.isoformat(),
-                "last_active": self.fake.date_time_between(start_date=reg_date, end_date="now").isoformat(),
-                "account_status": random.choices(
-                    ["active", "inactive", "suspended"], 
-                    weights=[0.85, 0.14, 0.01]
-                )[0],
-                "loyalty_tier": random.choices(
-                    ["bronze", "silver", "gold", "platinum"],
-                    weights=[0.6, 0.25, 0.12, 0.03]
-                )[0],
+                "last_active": self._random_datetime(reg_date, self.now).isoformat(),
+                "account_status": statuses[i],
+                "loyalty_tier": tiers[i],
                 "total_orders": 0,  # Will be updated during transaction generation
                 "lifetime_value": 0.0  # Will be calculated
             }
             
-            self.users.append(user)
+            users.append(user)
         
-        logger.info(f"Generated {len(self.users)} diverse user profiles")
-        return self.users
+        return users
 
     def save_data(self):
         """Save all generated data with proper organization"""
         logger.info("Saving datasets to organized structure...")
         
-        def json_serializer(obj):
-            if isinstance(obj, (datetime.datetime, datetime.date)):
-                return obj.isoformat()
-            raise TypeError(f"Type {type(obj)} not serializable")
-        
         # Save individual datasets
         datasets = {
             "categories.json": self.categories,
@@ -335,30 +499,94 @@ class EcommerceDataGenerator:
             "transactions.json": self.transactions
         }
         
+        use_parquet = self.config['FORMAT'] == 'parquet'
+        if use_parquet and not HAS_PYARROW:
+            logger.warning("pyarrow is not installed; saving JSON instead of Parquet")
+            use_parquet = False
+        
         for filename, data in datasets.items():
-            filepath = os.path.join("data/raw", filename)
-            with open(filepath, "w", encoding="utf-8") as f:
-                json.dump(data, f, default=json_serializer, indent=2, ensure_ascii=False)
-            logger.info(f" Saved {len(data):,} records to {filepath}")
+            if use_parquet:
+                filepath = os.path.join("data/raw", filename.replace(".json", ".parquet"))
+                count = self._write_parquet(filepath, data)
+            else:
+                filepath = os.path.join("data/raw", filename)
+                count = self._stream_json_array(filepath, data)
+            logger.info(f" Saved {count:,} records to {filepath}")
         
-        # Save sessions in chunks for better memory management
+        # Each sessions file is generated and written by a worker process with its own seed
+        logger.info("Creating realistic user session patterns...")
+        n = self.config['NUM_SESSIONS']
         chunk_size = self.config['CHUNK_SIZE']
-        for i in range(0, len(self.sessions), chunk_size):
-            chunk = self.sessions[i:i+chunk_size]
-            filename = f"sessions_{i//chunk_size:03d}.json"
-            filepath = os.path.join("data/raw", filename)
-            with open(filepath, "w", encoding="utf-8") as f:
-                json.dump(chunk, f, default=json_serializer, indent=2, ensure_ascii=False)
-            logger.info(f" Saved {len(chunk):,} sessions to {filepath}")
+        
+        # Workers only need what sessions reference: user ids and geo data, and the viewable products
+        session_users = [{"user_id": u["user_id"], "geo_data": u["geo_data"]} for u in self.users]
+        viewable_products = [{"product_id": p["product_id"]} for p in self.products[:100]]
+        
+        with ProcessPoolExecutor(max_workers=self.config['WORKERS'], initializer=_init_session_worker,
+                                 initargs=(self.config, self.now, session_users, viewable_products)) as executor:
+            futures = [
+                executor.submit(_write_session_chunk, self._shard_seed(SEED_STREAM_SESSIONS, chunk_index),
+                                chunk_index, min(chunk_size, n - start))
+                for chunk_index, start in enumerate(range(0, n, chunk_size))
+            ]
+            
+            for future in tqdm(as_completed(futures), total=len(futures), desc="Creating sessions"):
+                filepath, count, start_min, end_max = future.result()
+                self.session_count += count
+                if start_min and (self.session_start_min is None or start_min < self.session_start_min):
+                    self.session_start_min = start_min
+                if end_max and (self.session_end_max is None or end_max > self.session_end_max):
+                    self.session_end_max = end_max
+                logger.info(f" Saved {count:,} sessions to {filepath}")
         
         # Generate comprehensive summary
         self._generate_summary()
 
+    def _write_json(self, filepath: str, data: Any, default=None):
+        """Serialize data with orjson and write the UTF-8 bytes directly, indented for reading"""
+        with open(filepath, "wb") as f:
+            f.write(orjson.dumps(data, default=default, option=PRETTY_JSON_OPTIONS))
+
+    def _write_parquet(self, filepath: str, records: List[Dict]) -> int:
+        """Write records as a zstd-compressed Parquet file, returning how many were written"""
+        # Nested dicts become struct columns and lists of dicts (price_history, subcategories) list<struct>
+        table = pa.Table.from_pylist(records)
+        pq.write_table(table, filepath, compression='zstd')
+        return table.num_rows
+
+    def _stream_json_array(self, filepath: str, records: Iterable[Dict]) -> int:
+        """Write records as a JSON array one record at a time, returning how many were written"""
+        # Only one encoded record exists at a time, never the whole file as a single bytes object
+        option = PRETTY_JSON_OPTIONS if self.config['PRETTY_JSON'] else JSON_OPTIONS
+        count = 0
+        with open(filepath, "wb", buffering=1 << 20) as f:
+            f.write(b"[")
+            for record in records:
+                f.write(b",\n" if count else b"\n")
+                f.write(orjson.dumps(record, option=option))
+                count += 1
+            f.write(b"\n]")
+        return count
+
     def _generate_summary(self):
         """Generate detailed dataset statistics"""
-        total_revenue = sum(t["total"] for t in self.transactions)
+        total_revenue = self.total_revenue
         avg_transaction = total_revenue / len(self.transactions) if self.transactions else 0
-        conversion_rate = len(self.transactions) / len(self.sessions) if self.sessions else 0
+        conversion_rate = len(self.transactions) / self.session_count if self.session_count else 0
+        
+        # One pass over products and one over users for all their metrics; inventory value
+        # is read here because transactions deplete stock after the products are generated
+        active_products = rating_sum = inventory_value = products_with_reviews = 0
+        for p in self.products:
+            active_products += p["is_active"]
+            rating_sum += p["rating"]
+            inventory_value += p["base_price"] * p["current_stock"]
+            products_with_reviews += p["review_count"] > 0
+        
+        active_users = users_with_preferences = 0
+        for u in self.users:
+            active_users += u["account_status"] == "active"
+            users_with_preferences += bool(u["preferences"]["preferred_categories"])
         
         summary = {
             "generation_metadata": {
@@ -370,34 +598,33 @@ class EcommerceDataGenerator:
                 "categories": len(self.categories),
                 "products": len(self.products),
                 "users": len(self.users),
-                "sessions": len(self.sessions),
+                "sessions": self.session_count,
                 "transactions": len(self.transactions),
-                "total_records": len(self.categories) + len(self.products) + len(self.users) + len(self.sessions) + len(self.transactions)
+                "total_records": len(self.categories) + len(self.products) + len(self.users) + self.session_count + len(self.transactions)
             },
             "business_metrics": {
                 "total_revenue": round(total_revenue, 2),
                 "average_transaction_value": round(avg_transaction, 2),
                 "conversion_rate": round(conversion_rate * 100, 2),
-                "active_products": sum(1 for p in self.products if p["is_active"]),
-                "active_users": sum(1 for u in self.users if u["account_status"] == "active"),
-                "average_product_rating": round(sum(p["rating"] for p in self.products) / len(self.products), 2),
-                "total_inventory_value": sum(p["base_price"] * p["current_stock"] for p in self.products)
+                "active_products": active_products,
+                "active_users": active_users,
+                "average_product_rating": round(rating_sum / len(self.products), 2),
+                "total_inventory_value": inventory_value
             },
             "data_quality": {
-                "products_with_reviews": sum(1 for p in self.products if p["review_count"] > 0),
-                "users_with_preferences": sum(1 for u in self.users if u["preferences"]["preferred_categories"]),
-                "transactions_with_discounts": sum(1 for t in self.transactions if t.get("discount", 0) > 0)
+                "products_with_reviews": products_with_reviews,
+                "users_with_preferences": users_with_preferences,
+                "transactions_with_discounts": self.discounted_transactions
             },
             "time_range": {
-                "start_date": min(s["start_time"] for s in self.sessions) if self.sessions else None,
-                "end_date": max(s["end_time"] for s in self.sessions) if self.sessions else None
+                "start_date": self.session_start_min.isoformat() if self.session_start_min else None,
+                "end_date": self.session_end_max.isoformat() if self.session_end_max else None
             }
         }
         
         # Save summary
         summary_path = "data/raw/dataset_summary.json"
-        with open(summary_path, "w", encoding="utf-8") as f:
-            json.dump(summary, f, indent=2, default=str)
+        self._write_json(summary_path, summary, default=str)
         
         # Log key metrics
         logger.info("=" * 60)
@@ -423,9 +650,8 @@ class EcommerceDataGenerator:
             # Generate behavioral data (simplified for now)
             logger.info("Generating transactions and sessions...")
             self._generate_simple_transactions()
-            self._generate_simple_sessions()
             
-            # Save everything
+            # Save everything; sessions are generated while they are written
             self.save_data()
             
             logger.info(" Dataset generation completed successfully!")
@@ -439,13 +665,45 @@ class EcommerceDataGenerator:
         """Generate realistic transactions"""
         logger.info("Creating realistic transaction patterns...")
         
+        # Filter once; products leave the available list as soon as their stock runs out
+        active_users = [u for u in self.users if u["account_status"] == "active"]
+        available_products = [p for p in self.products if p["is_active"] and p["current_stock"] > 0]
+        available_positions = {p["product_id"]: i for i, p in enumerate(available_products)}
+        
+        # All transaction timestamps in one draw, formatted in one call
+        n = self.config['NUM_TRANSACTIONS']
+        timestamps = np.datetime_as_string(
+            self._random_timestamps(n, self._days_ago(self.config['TIMESPAN_DAYS']), self.now)
+        ).tolist()
+        
+        # Ids are slices of one seeded random draw: 6 bytes -> 12 hex characters each
+        transaction_ids = self.rng.bytes(6 * n).hex()
+        
+        # Preallocated; skipped iterations leave empty slots that are trimmed at the end
+        transactions = [None] * n
+        generated = 0
+        
+        # Draw the per-transaction choices as columns; the loop only indexes into them
+        rng = self.rng
+        user_idx = rng.integers(0, len(active_users), n).tolist()
+        item_counts = self._choose([1, 2, 3, 4, 5], n, p=[0.4, 0.3, 0.15, 0.1, 0.05])
+        discounted = (rng.random(n) < 0.25).tolist()  # 25% chance of discount
+        discount_rates = self._choose([0.05, 0.10, 0.15, 0.20], n)
+        payment_methods = self._choose([
+            "credit_card", "debit_card", "paypal", "apple_pay",
+            "google_pay", "bank_transfer", "gift_card"
+        ], n)
+        statuses = self._choose(
+            ["completed", "processing", "shipped", "delivered", "cancelled"], n,
+            p=[0.7, 0.1, 0.1, 0.08, 0.02]
+        )
+        
         # Generate transactions with realistic patterns
-        for _ in tqdm(range(self.config['NUM_TRANSACTIONS']), desc="Creating transactions"):
-            user = random.choice([u for u in self.users if u["account_status"] == "active"])
+        for i in tqdm(range(n), desc="Creating transactions"):
+            user = active_users[user_idx[i]]
             
             # Select 1-5 products for transaction
-            num_items = random.choices([1, 2, 3, 4, 5], weights=[0.4, 0.3, 0.15, 0.1, 0.05])[0]
-            available_products = [p for p in self.products if p["is_active"] and p["current_stock"] > 0]
+            num_items = item_counts[i]
             
             if len(available_products) < num_items:
                 continue
@@ -470,101 +728,159 @@ class EcommerceDataGenerator:
                 subtotal += item_subtotal
                 # Update stock
                 product["current_stock"] -= quantity
+                if product["current_stock"] <= 0:
+                    self._remove_available_product(product, available_products, available_positions)
             
             # Apply discounts
             discount = 0
-            if random.random() < 0.25:  # 25% chance of discount
-                discount_rate = random.choice([0.05, 0.10, 0.15, 0.20])
-                discount = round(subtotal * discount_rate, 2)
+            if discounted[i]:
+                discount = round(subtotal * discount_rates[i], 2)
             
             # Calculate tax and shipping
             tax = round(subtotal * 0.08, 2)  # 8% tax
             shipping = 0 if subtotal > 50 else 9.99  # Free shipping over $50
             
             total = round(subtotal - discount + tax + shipping, 2)
+            self.total_revenue += total
+            if discount > 0:
+                self.discounted_transactions += 1
             
             transaction = {
-                "transaction_id": f"txn_{uuid.uuid4().hex[:12]}",
+                "transaction_id": f"txn_{transaction_ids[12 * i:12 * i + 12]}",
                 "user_id": user["user_id"],
-                "timestamp": self.fake.date_time_between(
-                    start_date=f"-{self.config['TIMESPAN_DAYS']}d",
-                    end_date="now"
-                ).isoformat(),
+                "timestamp": timestamps[i],
                 "items": items,
                 "subtotal": round(subtotal, 2),
                 "discount": discount,
                 "tax": tax,
                 "shipping": shipping,
                 "total": total,
-                "payment_method": random.choice([
-                    "credit_card", "debit_card", "paypal", "apple_pay", 
-                    "google_pay", "bank_transfer", "gift_card"
-                ]),
-                "status": random.choices(
-                    ["completed", "processing", "shipped", "delivered", "cancelled"],
-                    weights=[0.7, 0.1, 0.1, 0.08, 0.02]
-                )[0],
-                "billing_address": user["geo_data"],
-                "shipping_address": user["geo_data"]
+                "payment_method": payment_methods[i],
+                "status": statuses[i]
+                # Billing/shipping geo is the user's geo_data; join on user_id instead of embedding it twice
             }
             
-            self.transactions.append(transaction)
+            transactions[generated] = transaction
+            generated += 1
             
             # Update user metrics
             user["total_orders"] += 1
             user["lifetime_value"] += total
-
-    def _generate_simple_sessions(self):
-        """Generate realistic user sessions"""
-        logger.info("Creating realistic user session patterns...")
         
-        for _ in tqdm(range(self.config['NUM_SESSIONS']), desc="Creating sessions"):
-            user = random.choice(self.users)
+        del transactions[generated:]
+        self.transactions = transactions
+
+    def _remove_available_product(self, product: Dict, available_products: List[Dict],
+                                  available_positions: Dict[str, int]):
+        """Drop an out-of-stock product in O(1) by moving the last available product into its slot"""
+        position = available_positions.pop(product["product_id"])
+        last = available_products.pop()
+        if last is not product:
+            available_products[position] = last
+            available_positions[last["product_id"]] = position
+
+    def _iter_sessions(self, count: int) -> Iterator[Dict]:
+        """Yield count realistic user sessions one at a time"""
+        rng = self.rng
+        viewable_product_ids = [p["product_id"] for p in self.products[:100]]
+        
+        # Draw each scalar column for the whole chunk at once; the loop only indexes into them
+        user_idx = rng.integers(0, len(self.users), count).tolist()
+        durations = rng.integers(30, 3601, count).tolist()
+        devices = self._choose(["mobile", "desktop", "tablet"], count)
+        browsers = self._choose(["Chrome", "Safari", "Firefox", "Edge"], count)
+        systems = self._choose(["iOS", "Android", "Windows", "macOS"], count)
+        pages = rng.integers(1, 16, count).tolist()
+        viewed_counts = rng.integers(0, 6, count).tolist()
+        conversions = self._choose(["converted", "abandoned", "browsed"], count, p=[0.03, 0.15, 0.82])
+        referrers = self._choose(["direct", "search_engine", "social_media", "email", "affiliate", "ads"], count)
+        
+        # Ids are slices of one seeded random draw: 5 bytes -> 10 hex characters each
+        session_ids = rng.bytes(5 * count).hex()
+        
+        # Start and end times for the whole chunk in NumPy, formatted in one call each
+        starts = self._random_timestamps(count, self._days_ago(self.config['TIMESPAN_DAYS']), self.now)
+        ends = starts + np.array(durations).astype('timedelta64[s]')
+        start_times = np.datetime_as_string(starts).tolist()
+        end_times = np.datetime_as_string(ends).tolist()
+        
+        # Running totals for the summary, since sessions are not kept
+        if count:
+            chunk_start_min, chunk_end_max = starts.min().item(), ends.max().item()
+            if self.session_start_min is None or chunk_start_min < self.session_start_min:
+                self.session_start_min = chunk_start_min
+            if self.session_end_max is None or chunk_end_max > self.session_end_max:
+                self.session_end_max = chunk_end_max
+        
+        for i in range(count):
+            user = self.users[user_idx[i]]
             
             session = {
-                "session_id": f"sess_{uuid.uuid4().hex[:10]}",
+                "session_id": f"sess_{session_ids[10 * i:10 * i + 10]}",
                 "user_id": user["user_id"],
-                "start_time": self.fake.date_time_between(
-                    start_date=f"-{self.config['TIMESPAN_DAYS']}d",
-                    end_date="now"
-                ).isoformat(),
-                "duration_seconds": random.randint(30, 3600),
-                "device_type": random.choice(["mobile", "desktop", "tablet"]),
-                "browser": random.choice(["Chrome", "Safari", "Firefox", "Edge"]),
-                "os": random.choice(["iOS", "Android", "Windows", "macOS"]),
-                "geo_data": {
-                    **user["geo_data"],
-                    "ip_address": self.fake.ipv4()
-                },
-                "pages_viewed": random.randint(1, 15),
-                "products_viewed": random.sample(
-                    [p["product_id"] for p in self.products[:100]], 
-                    k=random.randint(0, 5)
-                ),
-                "conversion_status": random.choices(
-                    ["converted", "abandoned", "browsed"],
-                    weights=[0.03, 0.15, 0.82]
-                )[0],
-                "referrer": random.choice([
-                    "direct", "search_engine", "social_media", 
-                    "email", "affiliate", "ads"
-                ])
+                "start_time": start_times[i],
+                "duration_seconds": durations[i],
+                "device_type": devices[i],
+                "browser": browsers[i],
+                "os": systems[i],
+                "geo_data": user["geo_data"],  # Shared with the user, not copied
+                "ip_address": self.fake_ipv4(),
+                "pages_viewed": pages[i],
+                "products_viewed": random.sample(viewable_product_ids, k=viewed_counts[i]),
+                "conversion_status": conversions[i],
+                "referrer": referrers[i],
+                "end_time": end_times[i]
             }
             
-            # Set end time
-            start_time = datetime.datetime.fromisoformat(session["start_time"])
-            end_time = start_time + datetime.timedelta(seconds=session["duration_seconds"])
-            session["end_time"] = end_time.isoformat()
-            
-            self.sessions.append(session)
+            self.session_count += 1
+            yield session
+
+
+def _worker_generator(seed: int, config: Dict, now: datetime.datetime) -> EcommerceDataGenerator:
+    """Generator for a worker process, with its own seed and the parent's config and clock"""
+    generator = EcommerceDataGenerator(seed=seed)
+    generator.config = config
+    generator.now = now
+    return generator
+
+
+def _generate_user_shard(seed: int, start: int, count: int, config: Dict,
+                         now: datetime.datetime, categories: List[Dict]) -> List[Dict]:
+    """Process-pool worker: generate one shard of users"""
+    generator = _worker_generator(seed, config, now)
+    generator.categories = categories
+    return generator._build_users(start, count)
+
+
+# Users and products sampled by session workers, set once per worker process
+_session_context = None
+
+
+def _init_session_worker(config: Dict, now: datetime.datetime, users: List[Dict], products: List[Dict]):
+    """Process-pool initializer: keep the context every session chunk samples from"""
+    global _session_context
+    _session_context = (config, now, users, products)
+
+
+def _write_session_chunk(seed: int, chunk_index: int, count: int):
+    """Process-pool worker: generate and write one sessions file, returning its count and time range"""
+    config, now, users, products = _session_context
+    generator = _worker_generator(seed, config, now)
+    generator.users = users
+    generator.products = products
+    
+    filepath = os.path.join("data/raw", f"sessions_{chunk_index:03d}.json")
+    count = generator._stream_json_array(filepath, generator._iter_sessions(count))
+    return filepath, count, generator.session_start_min, generator.session_end_max
 
 
 class InventoryManager:
-    """Thread-safe inventory management"""
+    """Inventory management, thread-safe when created with threaded=True"""
     
-    def __init__(self, products: List[Dict]):
+    def __init__(self, products: List[Dict], threaded: bool = False):
         self.products = {p["product_id"]: p for p in products}
-        self.lock = threading.RLock()
+        # Generation is single-threaded, so the lock is a no-op unless explicitly requested
+        self.lock = threading.RLock() if threaded else nullcontext()
     
     def update_stock(self, product_id: str, quantity: int) -> bool:
         with self.lock:
@@ -4,13 +4,19 @@ Complete Multi-Database E-commerce Analytics - FIXED VERSION
 AUCA Big Data Analytics Final Project
 """
 
+import builtins
 import os
 import sys
 import json
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import Dict, List, Any
+from itertools import chain
+from typing import Dict, List, Any, Optional
 
+import orjson
+import pandas as pd
+from pyspark import StorageLevel
 from pyspark.sql import SparkSession
 from pyspark.sql.functions import *
 from pyspark.sql.types import *
@@ -20,140 +26,239 @@ import pymongo
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+MONGO_DATABASE = "ecommerce_analytics"
+MONGO_SPARK_PACKAGE = "org.mongodb.spark:mongo-spark-connector_2.12:10.4.0"
+MONGO_PARTITIONER = "com.mongodb.spark.sql.connector.read.partitioner.SamplePartitioner"
+SESSIONS_LIMIT = 10000  # Limit for performance
+CHUNK_SIZE = 10000
+CURSOR_BATCH_SIZE = 5000
+READ_WORKERS = 8
+SUMMARY_ROWS = 100  # Rows of each result kept in the JSON summary
+# PySpark's MEMORY_ONLY is the serialized level (the old MEMORY_ONLY_SER)
+CACHE_LEVEL = StorageLevel.MEMORY_ONLY
+
+# Flat column schemas of the analytics DataFrames
+USERS_SCHEMA = StructType([
+    StructField("user_id", StringType()),
+    StructField("age", IntegerType()),
+    StructField("income_bracket", StringType()),
+    StructField("country", StringType()),
+    StructField("account_status", StringType()),
+    StructField("total_orders", IntegerType()),
+    StructField("lifetime_value", DoubleType())
+])
+
+PRODUCTS_SCHEMA = StructType([
+    StructField("product_id", StringType()),
+    StructField("name", StringType()),
+    StructField("category_id", StringType()),
+    StructField("brand", StringType()),
+    StructField("base_price", DoubleType()),
+    StructField("current_stock", IntegerType()),
+    StructField("rating", DoubleType()),
+    StructField("is_active", BooleanType())
+])
+
+TRANSACTIONS_SCHEMA = StructType([
+    StructField("transaction_id", StringType()),
+    StructField("user_id", StringType()),
+    StructField("timestamp", TimestampType()),
+    StructField("total", DoubleType()),
+    StructField("subtotal", DoubleType()),
+    StructField("status", StringType()),
+    StructField("payment_method", StringType()),
+    StructField("item_count", IntegerType())
+])
+
+SESSIONS_SCHEMA = StructType([
+    StructField("session_id", StringType()),
+    StructField("user_id", StringType()),
+    StructField("duration_seconds", IntegerType()),
+    StructField("conversion_status", StringType()),
+    StructField("device_type", StringType()),
+    StructField("pages_viewed", IntegerType()),
+    StructField("products_viewed_count", IntegerType())
+])
+
+# Server-side $project stages that flatten and type each collection into the schemas above
+USERS_PROJECTION = {
+    "_id": 0,
+    "user_id": {"$toString": "$user_id"},
+    "age": {"$toInt": {"$ifNull": ["$demographics.age", 0]}},
+    "income_bracket": {"$ifNull": ["$demographics.income_bracket", "unknown"]},
+    "country": {"$ifNull": ["$geo_data.country", "unknown"]},
+    "account_status": {"$ifNull": ["$account_status", "unknown"]},
+    "total_orders": {"$toInt": {"$ifNull": ["$total_orders", 0]}},
+    "lifetime_value": {"$toDouble": {"$ifNull": ["$lifetime_value", 0.0]}}
+}
+
+PRODUCTS_PROJECTION = {
+    "_id": 0,
+    "product_id": {"$toString": "$product_id"},
+    "name": {"$ifNull": ["$name", ""]},
+    "category_id": {"$ifNull": ["$category_id", ""]},
+    "brand": {"$ifNull": ["$brand", ""]},
+    "base_price": {"$toDouble": {"$ifNull": ["$base_price", 0.0]}},
+    "current_stock": {"$toInt": {"$ifNull": ["$current_stock", 0]}},
+    "rating": {"$toDouble": {"$ifNull": ["$rating", 0.0]}},
+    "is_active": {"$toBool": {"$ifNull": ["$is_active", True]}}
+}
+
+TRANSACTIONS_PROJECTION = {
+    "_id": 0,
+    "transaction_id": {"$toString": "$transaction_id"},
+    "user_id": {"$toString": "$user_id"},
+    "timestamp": {"$toDate": "$timestamp"},
+    "total": {"$toDouble": {"$ifNull": ["$total", 0.0]}},
+    "subtotal": {"$toDouble": {"$ifNull": ["$subtotal", 0.0]}},
+    "status": {"$ifNull": ["$status", "unknown"]},
+    "payment_method": {"$ifNull": ["$payment_method", "unknown"]},
+    "item_count": {"$size": {"$ifNull": ["$items", []]}}
+}
+
+SESSIONS_PROJECTION = {
+    "_id": 0,
+    "session_id": {"$toString": "$session_id"},
+    "user_id": {"$toString": "$user_id"},
+    "duration_seconds": {"$toInt": {"$ifNull": ["$duration_seconds", 0]}},
+    "conversion_status": {"$ifNull": ["$conversion_status", "browsed"]},
+    "device_type": {"$ifNull": ["$device_type", "unknown"]},
+    "pages_viewed": {"$toInt": {"$ifNull": ["$pages_viewed", 0]}},
+    "products_viewed_count": {"$size": {"$ifNull": ["$viewed_products", []]}}
+}
+
+# Only completed transactions feed the analyses, so the rest never leave MongoDB
+TRANSACTIONS_MATCH = {"status": "completed"}
+
 class CompleteEcommerceAnalytics:
     """Complete multi-database analytics with fixed data type handling"""
     
-    def __init__(self):
-        self.spark = self._create_spark_session()
+    def __init__(self, use_connector: bool = True):
         self.mongo_uri = "mongodb://localhost:27017/ecommerce_analytics"
+        self.use_connector = use_connector
+        self.spark = self._create_spark_session()
         self.results = {}
+        self.cached_dfs = []
         
         # Create output directory
         os.makedirs("output", exist_ok=True)
         
     def _create_spark_session(self):
         """Create optimized Spark session"""
-        return SparkSession.builder \
+        builder = SparkSession.builder \
             .appName("CompleteEcommerceAnalytics") \
             .config("spark.sql.adaptive.enabled", "true") \
-            .config("spark.driver.memory", "4g") \
-            .getOrCreate()
+            .config("spark.sql.adaptive.coalescePartitions.enabled", "true") \
+            .config("spark.sql.adaptive.advisoryPartitionSizeInBytes", "134217728") \
+            .config("spark.sql.adaptive.skewJoin.enabled", "true") \
+            .config("spark.sql.adaptive.skewJoin.skewedPartitionFactor", "5") \
+            .config("spark.sql.adaptive.skewJoin.skewedPartitionThresholdInBytes", "67108864") \
+            .config("spark.sql.shuffle.partitions", "64") \
+            .config("spark.sql.autoBroadcastJoinThreshold", "104857600") \
+            .config("spark.sql.execution.arrow.pyspark.enabled", "true") \
+            .config("spark.serializer", "org.apache.spark.serializer.KryoSerializer") \
+            .config("spark.kryo.registrationRequired", "false") \
+            .config("spark.driver.memory", "4g")
+        
+        if self.use_connector:
+            builder = builder \
+                .config("spark.jars.packages", MONGO_SPARK_PACKAGE) \
+                .config("spark.mongodb.read.connection.uri", self.mongo_uri)
+        
+        return builder.getOrCreate()
 
     def load_mongodb_data(self):
         """Load data from MongoDB with proper type handling"""
         logger.info(" Loading data from MongoDB...")
         
+        if self.use_connector:
+            # Executors read their own partitions straight from MongoDB
+            self.users_df = self._read_collection("users", USERS_SCHEMA, USERS_PROJECTION)
+            self.products_df = self._read_collection("products", PRODUCTS_SCHEMA, PRODUCTS_PROJECTION)
+            self.transactions_df = self._read_collection(
+                "transactions", TRANSACTIONS_SCHEMA, TRANSACTIONS_PROJECTION, TRANSACTIONS_MATCH
+            )
+            self.sessions_df = self._read_collection("sessions", SESSIONS_SCHEMA, SESSIONS_PROJECTION).limit(SESSIONS_LIMIT)
+            logger.info(" MongoDB data loaded successfully")
+            return
+        
         client = pymongo.MongoClient(self.mongo_uri)
-        db = client.ecommerce_analytics
+        db = client[MONGO_DATABASE]
         
         # Load collections with explicit schemas
-        self.users_df = self._create_users_dataframe(list(db.users.find()))
-        self.products_df = self._create_products_dataframe(list(db.products.find()))
-        self.transactions_df = self._create_transactions_dataframe(list(db.transactions.find()))
-        self.sessions_df = self._create_sessions_dataframe(list(db.sessions.find().limit(10000)))  # Limit for performance
+        self.users_df = self._create_dataframe("users", self._fetch_collection(db.users, USERS_PROJECTION), USERS_SCHEMA)
+        self.products_df = self._create_dataframe(
+            "products", self._fetch_collection(db.products, PRODUCTS_PROJECTION), PRODUCTS_SCHEMA
+        )
+        self.transactions_df = self._create_dataframe(
+            "transactions",
+            self._fetch_collection(db.transactions, TRANSACTIONS_PROJECTION, match=TRANSACTIONS_MATCH),
+            TRANSACTIONS_SCHEMA
+        )
+        self.sessions_df = self._create_dataframe(
+            "sessions", self._fetch_collection(db.sessions, SESSIONS_PROJECTION, SESSIONS_LIMIT), SESSIONS_SCHEMA
+        )
         
         client.close()
         logger.info(" MongoDB data loaded successfully")
 
-    def _create_users_dataframe(self, users_data):
-        """Create users DataFrame with explicit schema"""
-        if not users_data:
-            return self.spark.createDataFrame([], StructType([]))
+    def cache_datasets(self):
+        """Persist the DataFrames that several analyses scan"""
+        # transactions_df only holds completed transactions (TRANSACTIONS_MATCH)
+        self.completed_tx = self.transactions_df.persist(CACHE_LEVEL)
+        self.users_df = self.users_df.persist(CACHE_LEVEL)
+        self.products_df = self.products_df.persist(CACHE_LEVEL)
+        self.cached_dfs = [self.completed_tx, self.users_df, self.products_df]
         
-        # Clean and structure user data
-        cleaned_users = []
-        for user in users_data:
-            cleaned_user = {
-                'user_id': str(user.get('user_id', '')),
-                'age': int(user.get('demographics', {}).get('age', 0)),
-                'income_bracket': str(user.get('demographics', {}).get('income_bracket', 'unknown')),
-                'country': str(user.get('geo_data', {}).get('country', 'unknown')),
-                'account_status': str(user.get('account_status', 'unknown')),
-                'total_orders': int(user.get('total_orders', 0)),
-                'lifetime_value': float(user.get('lifetime_value', 0.0))
-            }
-            cleaned_users.append(cleaned_user)
-        
-        df = self.spark.createDataFrame(cleaned_users)
-        logger.info(f" users: {df.count():,} records")
-        return df
+        # Materialize the completed transactions once up front
+        logger.info(f" completed transactions: {self.completed_tx.count():,} records")
 
-    def _create_products_dataframe(self, products_data):
-        """Create products DataFrame with explicit schema"""
-        if not products_data:
-            return self.spark.createDataFrame([], StructType([]))
-        
-        cleaned_products = []
-        for product in products_data:
-            cleaned_product = {
-                'product_id': str(product.get('product_id', '')),
-                'name': str(product.get('name', '')),
-                'category_id': str(product.get('category_id', '')),
-                'brand': str(product.get('brand', '')),
-                'base_price': float(product.get('base_price', 0.0)),
-                'current_stock': int(product.get('current_stock', 0)),
-                'rating': float(product.get('rating', 0.0)),
-                'is_active': bool(product.get('is_active', True))
-            }
-            cleaned_products.append(cleaned_product)
-        
-        df = self.spark.createDataFrame(cleaned_products)
-        logger.info(f" products: {df.count():,} records")
+    def _read_collection(self, collection: str, schema: StructType, projection: Dict[str, Any],
+                         match: Optional[Dict[str, Any]] = None):
+        """Read a collection through the MongoDB Spark connector with a fixed schema"""
+        pipeline = [{"$match": match}] if match else []
+        pipeline.append({"$project": projection})
+        df = self.spark.read.format("mongodb") \
+            .option("database", MONGO_DATABASE) \
+            .option("collection", collection) \
+            .option("aggregation.pipeline", json.dumps(pipeline)) \
+            .option("partitioner", MONGO_PARTITIONER) \
+            .option("partitioner.options.partition.size", "64") \
+            .schema(schema) \
+            .load()
+        logger.info(f" {collection}: {df.rdd.getNumPartitions()} partitions")
         return df
 
-    def _create_transactions_dataframe(self, transactions_data):
-        """Create transactions DataFrame with explicit schema"""
-        if not transactions_data:
-            return self.spark.createDataFrame([], StructType([]))
+    def _fetch_collection(self, collection, projection: Dict[str, Any], limit: Optional[int] = None,
+                          match: Optional[Dict[str, Any]] = None) -> List[Dict]:
+        """Fetch flattened, typed documents with concurrent skip/limit aggregation cursors"""
+        match = match or {}
+        total = collection.count_documents(match)
+        # pyspark.sql.functions' star import shadows the builtin min with the column aggregate
+        if limit is not None:
+            total = builtins.min(total, limit)
         
-        cleaned_transactions = []
-        for txn in transactions_data:
-            # Convert timestamp
-            timestamp_str = txn.get('timestamp', '')
-            if isinstance(timestamp_str, str):
-                try:
-                    timestamp = datetime.fromisoformat(timestamp_str.replace('Z', '+00:00'))
-                except:
-                    timestamp = datetime.now()
-            else:
-                timestamp = timestamp_str if timestamp_str else datetime.now()
-            
-            cleaned_txn = {
-                'transaction_id': str(txn.get('transaction_id', '')),
-                'user_id': str(txn.get('user_id', '')),
-                'timestamp': timestamp,
-                'total': float(txn.get('total', 0.0)),
-                'subtotal': float(txn.get('subtotal', 0.0)),
-                'status': str(txn.get('status', 'unknown')),
-                'payment_method': str(txn.get('payment_method', 'unknown')),
-                'item_count': len(txn.get('items', []))
-            }
-            cleaned_transactions.append(cleaned_txn)
+        def fetch(skip):
+            # Sorting on _id keeps the chunk boundaries stable between cursors
+            pipeline = [
+                {"$match": match},
+                {"$sort": {"_id": 1}},
+                {"$skip": skip},
+                {"$limit": builtins.min(CHUNK_SIZE, total - skip)},
+                {"$project": projection}
+            ]
+            return list(collection.aggregate(pipeline, allowDiskUse=True, batchSize=CURSOR_BATCH_SIZE))
         
-        df = self.spark.createDataFrame(cleaned_transactions)
-        logger.info(f" transactions: {df.count():,} records")
-        return df
+        with ThreadPoolExecutor(max_workers=READ_WORKERS) as executor:
+            chunks = executor.map(fetch, range(0, total, CHUNK_SIZE))
+            return list(chain.from_iterable(chunks))
 
-    def _create_sessions_dataframe(self, sessions_data):
-        """Create sessions DataFrame with explicit schema"""
-        if not sessions_data:
-            return self.spark.createDataFrame([], StructType([]))
-        
-        cleaned_sessions = []
-        for session in sessions_data:
-            cleaned_session = {
-                'session_id': str(session.get('session_id', '')),
-                'user_id': str(session.get('user_id', '')),
-                'duration_seconds': int(session.get('duration_seconds', 0)),
-                'conversion_status': str(session.get('conversion_status', 'browsed')),
-                'device_type': str(session.get('device_type', 'unknown')),
-                'pages_viewed': int(session.get('pages_viewed', 0)),
-                'products_viewed_count': len(session.get('viewed_products', []))
-            }
-            cleaned_sessions.append(cleaned_session)
-        
-        df = self.spark.createDataFrame(cleaned_sessions)
-        logger.info(f" sessions: {df.count():,} records")
+    def _create_dataframe(self, name: str, records: List[Dict], schema: StructType):
+        """Create a DataFrame from documents already shaped by the $project stage"""
+        # A pandas frame goes over Arrow as columnar batches instead of pickled rows
+        pdf = pd.DataFrame.from_records(records, columns=schema.fieldNames())
+        df = self.spark.createDataFrame(pdf, schema=schema)
+        logger.info(f" {name}: {len(records):,} records")
         return df
 
     def customer_segmentation_analysis(self):
@@ -162,8 +267,7 @@ class CompleteEcommerceAnalytics:
         
         try:
             # Calculate basic customer metrics
-            customer_metrics = self.transactions_df.filter(col("status") == "completed") \
-                .groupBy("user_id") \
+            customer_metrics = self.completed_tx.groupBy("user_id") \
                 .agg(
                     count("transaction_id").alias("frequency"),
                     sum("total").alias("monetary"),
@@ -171,9 +275,9 @@ class CompleteEcommerceAnalytics:
                     max("timestamp").alias("last_purchase")
                 )
             
-            # Add user demographics
+            # Add user demographics; the narrow users table is shipped to every executor
             customer_analysis = customer_metrics.join(
-                self.users_df.select("user_id", "age", "income_bracket", "country"),
+                broadcast(self.users_df.select("user_id", "age", "income_bracket", "country")),
                 "user_id", "inner"
             )
             
@@ -196,7 +300,7 @@ class CompleteEcommerceAnalytics:
                 ) \
                 .orderBy("avg_monetary", ascending=False)
             
-            self.results['customer_segments'] = [row.asDict() for row in segment_summary.collect()]
+            self.results['customer_segments'] = self._write_result(segment_summary, "segments")
             logger.info(" Customer segmentation completed")
             
             return segment_summary
@@ -210,14 +314,7 @@ class CompleteEcommerceAnalytics:
         logger.info(" Analyzing Product Performance...")
         
         try:
-            # Basic product performance from transactions
-            product_performance = self.transactions_df.filter(col("status") == "completed") \
-                .groupBy("user_id") \
-                .agg(count("transaction_id").alias("purchase_count")) \
-                .groupBy("purchase_count") \
-                .agg(count("user_id").alias("customer_count"))
-            
-            # Join with product details
+            # Category summary from product details
             top_categories = self.products_df.groupBy("category_id") \
                 .agg(
                     count("product_id").alias("product_count"),
@@ -226,7 +323,7 @@ class CompleteEcommerceAnalytics:
                 ) \
                 .orderBy("product_count", ascending=False)
             
-            self.results['top_categories'] = [row.asDict() for row in top_categories.collect()]
+            self.results['top_categories'] = self._write_result(top_categories, "top_categories")
             logger.info(" Product performance analysis completed")
             
             return top_categories
@@ -240,25 +337,37 @@ class CompleteEcommerceAnalytics:
         logger.info("💡 Generating Business Insights...")
         
         try:
-            # Key metrics
-            total_revenue = self.transactions_df.filter(col("status") == "completed") \
-                .agg(sum("total")).collect()[0][0]
+            # Key metrics, one aggregation job per DataFrame
+            revenue = self.completed_tx.agg(
+                sum("total").alias("total_revenue"),
+                avg("total").alias("avg_order_value")
+            ).collect()[0]
+            
+            users = self.users_df.agg(
+                sum(when(col("account_status") == "active", 1).otherwise(0)).alias("active_users")
+            ).collect()[0]
             
-            total_customers = self.users_df.filter(col("account_status") == "active").count()
-            total_sessions = self.sessions_df.count()
-            converted_sessions = self.sessions_df.filter(col("conversion_status") == "converted").count()
+            sessions = self.sessions_df.agg(
+                count("*").alias("total_sessions"),
+                sum(when(col("conversion_status") == "converted", 1).otherwise(0)).alias("converted_sessions")
+            ).collect()[0]
             
-            avg_order_value = self.transactions_df.filter(col("status") == "completed") \
-                .agg(avg("total")).collect()[0][0]
+            products = self.products_df.agg(
+                count("*").alias("total_products"),
+                sum(when(col("is_active") == True, 1).otherwise(0)).alias("active_products")
+            ).collect()[0]
+            
+            total_sessions = sessions["total_sessions"]
+            converted_sessions = sessions["converted_sessions"] or 0
             
             insights = {
-                "total_revenue": float(total_revenue) if total_revenue else 0,
-                "total_customers": total_customers,
+                "total_revenue": float(revenue["total_revenue"]) if revenue["total_revenue"] else 0,
+                "total_customers": users["active_users"] or 0,
                 "total_sessions": total_sessions,
                 "conversion_rate": (converted_sessions / total_sessions * 100) if total_sessions > 0 else 0,
-                "avg_order_value": float(avg_order_value) if avg_order_value else 0,
-                "total_products": self.products_df.count(),
-                "active_products": self.products_df.filter(col("is_active") == True).count()
+                "avg_order_value": float(revenue["avg_order_value"]) if revenue["avg_order_value"] else 0,
+                "total_products": products["total_products"],
+                "active_products": products["active_products"] or 0
             }
             
             self.results['business_insights'] = insights
@@ -270,6 +379,13 @@ class CompleteEcommerceAnalytics:
             logger.error(f" Business insights failed: {str(e)}")
             return {}
 
+    def _write_result(self, df, name: str) -> List[Dict]:
+        """Write a result DataFrame to Parquet and return its leading rows for the JSON summary"""
+        path = f"output/{name}.parquet"
+        df.coalesce(1).write.mode("overwrite").parquet(path)
+        # Read the summary back from the file so the result's plan is not run a second time
+        return [row.asDict() for row in self.spark.read.parquet(path).limit(SUMMARY_ROWS).collect()]
+
     def save_results(self):
         """Save analysis results"""
         logger.info("💾 Saving results...")
@@ -283,8 +399,12 @@ class CompleteEcommerceAnalytics:
         
         # Save to JSON
         output_file = "output/analytics_results.json"
-        with open(output_file, 'w') as f:
-            json.dump(self.results, f, indent=2, default=str)
+        with open(output_file, 'wb') as f:
+            f.write(orjson.dumps(
+                self.results,
+                option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NAIVE_UTC,
+                default=str
+            ))
         
         logger.info(f" Results saved to {output_file}")
 
@@ -295,6 +415,7 @@ class CompleteEcommerceAnalytics:
         try:
             # Load data
             self.load_mongodb_data()
+            self.cache_datasets()
             
             # Run analyses
             self.customer_segmentation_analysis()
@@ -314,6 +435,8 @@ class CompleteEcommerceAnalytics:
             raise
         
         finally:
+            for df in self.cached_dfs:
+                df.unpersist()
             self.spark.stop()
 
     def _print_summary(self):